@@ -8,6 +8,7 @@ from app.controller.productservice_controller import productservice_blueprint
 from app.controller.fin_controller import fin_blueprint
 from app.controller.notifcation_controller import notification_blueprint
 from app.controller.chat_controller import chat_blueprint
+from app.service.readiness_service import start_background_bootstrap
 
 app = Flask(__name__)
 app.register_blueprint(hello_blueprint)
@@ -20,3 +21,9 @@ app.register_blueprint(notification_blueprint, url_prefix='/notification')
 app.register_blueprint(chat_blueprint, url_prefix='/chat')
 
 CORS(app)
+
+# Index/schema bootstrap starts with the first request of each worker, never
+# at import (which would connect from a pre-fork master); see /ready for its status
+@app.before_request
+def _bootstrap_once():
+    start_background_bootstrap()
@@ -4,7 +4,9 @@ from app.models.registration_model import AddUserSchema, AddFieldSchema
 from pydantic import ValidationError
 from app.mongo.agri_handlers import FIELD_HANDLER, ALERT_STORAGE_HANDLER, AGRI_PRODUCT_SERVICE_SUGGESTION_HANDLER
 from app.service.alertsugg_service import run_action_suggestion_pipeline
+from app.service.fleet_service import start_fleet_run, fleet_status
 from app.service.disease_service import DISEASE_PREDICTION_PIPELINE
+from app.mongo.dates import date_range
 import os
 
 alert_blueprint = Blueprint('alert', __name__)
@@ -32,6 +34,74 @@ def trigger_alert():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+FLEET_MAX_DAYS = int(os.getenv("FLEET_MAX_DAYS", "15"))
+FLEET_MAX_WORKERS = int(os.getenv("FLEET_MAX_WORKERS", "32"))
+
+
+def _optional_int(data, key, maximum):
+    """
+    Reads an optional integer in [1, maximum] from the request body.
+    Raises ValueError with a client-facing message otherwise.
+    """
+    value = data.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= maximum:
+        raise ValueError(f"{key} must be an integer between 1 and {maximum}")
+    return value
+
+
+@alert_blueprint.route('/fleet-trigger', methods=['POST'])
+def fleet_trigger():
+    """
+    Starts alert generation for every registered hub in the background.
+    Pass a run_id to resume an interrupted run.
+    Sample request JSON:
+    {
+        "run_id": "fleet_2025-01-01T00-00-00",  # optional
+        "days": 7,                              # optional
+        "max_workers": 4                        # optional
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        days = _optional_int(data, 'days', FLEET_MAX_DAYS)
+        max_workers = _optional_int(data, 'max_workers', FLEET_MAX_WORKERS)
+        run_id = data.get('run_id')
+        if run_id is not None and not isinstance(run_id, str):
+            raise ValueError("run_id must be a string")
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    try:
+        run_id = start_fleet_run(
+            run_id=run_id,
+            days=days,
+            max_workers=max_workers
+        )
+        return jsonify({'success': True, 'run_id': run_id}), 202
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@alert_blueprint.route('/fleet-status', methods=['GET'])
+def get_fleet_status():
+    """
+    Progress, throughput and failures of a fleet run (the latest one unless ?run_id= is given).
+    """
+    try:
+        status = fleet_status(request.args.get('run_id'))
+        if not status:
+            return jsonify({'success': False, 'message': 'No fleet run found'}), 404
+        return jsonify({'success': True, 'status': status}), 200
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 @alert_blueprint.route('/get-alerts-by-hub', methods=['POST'])
 def get_alerts():
     """
@@ -54,7 +124,6 @@ def get_alerts():
         for alert in alerts:
             if isinstance(alert, dict) and '_id' in alert:
                 alert['_id'] = str(alert['_id'])
-                del alert['vector']  # Assuming vector is not needed in the response
         return jsonify({'success': True, 'alerts': alerts}), 200
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -87,7 +156,6 @@ def get_alerts_by_user():
         for alert in alerts:
             if isinstance(alert, dict) and '_id' in alert:
                 alert['_id'] = str(alert['_id'])
-                del alert['vector']
         return jsonify({'success': True, 'alerts': alerts}), 200
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -108,6 +176,12 @@ def trigger_product_service():
 
     if not sensor_hub_id or not date:
         return jsonify({'success': False, 'message': 'Sensor Hub ID and date are required'}), 400
+    try:
+        if not isinstance(date, str):
+            raise ValueError(date)
+        date_range(date)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'date must be YYYY, YYYY-MM, YYYY-MM-DD or an ISO 8601 timestamp'}), 400
 
     try:
         # Assuming a function to trigger product service based on sensor hub ID and date
@@ -123,12 +197,10 @@ def trigger_product_service():
             p = p['product_service']
             if isinstance(p, dict) and '_id' in p:
                 p['_id'] = str(p['_id'])
-                del p['vector']
         for s in result['services']:
             s = s['product_service']
             if isinstance(s, dict) and '_id' in s:
                 s['_id'] = str(s['_id'])
-                del s['vector']
         return jsonify({'success': True, 'result': result}), 200
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
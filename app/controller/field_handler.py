@@ -1,10 +1,15 @@
-from flask import Blueprint, request, jsonify
+from datetime import datetime
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from app.service.hello_service import get_hello_message
 from app.models.registration_model import AddUserSchema, AddFieldSchema
 from pydantic import ValidationError
 from app.mongo.agri_handlers import USER_HANDLER, FIELD_HANDLER
 from app.service.weather_service import TOMORROW_WEATHER_SERVICE
 from app.postgres.rds import RDS_POSTGRES_DB
+from app.postgres.ingest import SENSOR_INGEST_BUFFER, SensorIngestBufferFull, parse_sensor_payload
+from app.postgres.rollups import query_rollup_stats
+from app.postgres.schema import ROLLUP_GRANULARITIES
+from app.postgres.sensor_queries import query_sensor_page, query_sensor_downsampled, export_sensor_rows, EXPORT_FORMATS
 
 field_blueprint = Blueprint('field', __name__)
 
@@ -133,24 +138,136 @@ def delete_field():
 
 @field_blueprint.route('/get-sensor-data-by-hubid', methods=['POST'])
 def get_sensor_data_by_hub():   
+    """
+    Readings of a hub, newest first, one page at a time. Pass the returned
+    "next_cursor" back as "cursor" to get the following page (null on the last page).
+    Optional: "from"/"to" ISO timestamps, "columns", "limit", "order" ("asc" | "desc").
+    With "points" the window is downsampled for charting instead
+    ("method": "bucket" time-bucket averages or "lttb").
+    With "granularity": "hourly" | "daily" the maintained summaries are returned.
+    Sample JSON:
+    {
+        "sensor_hub_id": "hub_1",
+        "from": "2025-08-01T00:00:00",
+        "to": "2025-08-16T00:00:00",
+        "columns": ["temperature", "humidity"],
+        "limit": 500,
+        "cursor": null
+    }
+    """
     data = request.get_json()
     sensor_hub_id = data.get('sensor_hub_id')
+    granularity = data.get('granularity', 'raw')
     
     if not sensor_hub_id:
         return jsonify({'success': False, 'message': 'Sensor Hub ID is required'}), 400
+    if granularity != 'raw' and granularity not in ROLLUP_GRANULARITIES:
+        return jsonify({'success': False, 'message': f"granularity must be one of: raw, {', '.join(ROLLUP_GRANULARITIES)}"}), 400
     
+    next_cursor = None
     try:
-        sensor_data = RDS_POSTGRES_DB.query_data(
-            f"SELECT * FROM arduino_data WHERE sensor_hub_id = '{sensor_hub_id}'"
-        )
-        if sensor_data:
-            return jsonify({'success': True, 'data': sensor_data}), 200
+        if granularity != 'raw':
+            columns, rows = query_rollup_stats(RDS_POSTGRES_DB, sensor_hub_id, granularity, data.get('limit'))
+        elif data.get('points'):
+            columns, rows = query_sensor_downsampled(
+                RDS_POSTGRES_DB, sensor_hub_id, int(data['points']),
+                method=data.get('method', 'bucket'), columns=data.get('columns'),
+                start=data.get('from'), end=data.get('to')
+            )
         else:
-            return jsonify({'success': False, 'message': 'No data found for this hub'}), 404
+            columns, rows, next_cursor = query_sensor_page(
+                RDS_POSTGRES_DB, sensor_hub_id, columns=data.get('columns'),
+                start=data.get('from'), end=data.get('to'), limit=data.get('limit'),
+                cursor=data.get('cursor'), order=data.get('order', 'desc')
+            )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
+
+    # timestamp/bucket are timestamptz columns; keep returning ISO strings
+    sensor_data = [columns, [
+        [value.isoformat() if isinstance(value, datetime) else value for value in row]
+        for row in rows
+    ]]
+    return jsonify({'success': True, 'data': sensor_data, 'next_cursor': next_cursor}), 200
     
 
+@field_blueprint.route('/export-sensor-data', methods=['GET'])
+def export_sensor_data():
+    """
+    Streams the full history of a hub for offline analysis.
+    Query parameters: sensor_hub_id (required), format=ndjson|csv (default ndjson),
+    from/to ISO timestamps, columns=temperature,humidity
+    e.g. /field/export-sensor-data?sensor_hub_id=hub_1&format=csv&from=2025-01-01
+    """
+    sensor_hub_id = request.args.get('sensor_hub_id')
+    fmt = request.args.get('format', 'ndjson')
+    columns = request.args.get('columns')
+
+    if not sensor_hub_id:
+        return jsonify({'success': False, 'message': 'Sensor Hub ID is required'}), 400
+
+    try:
+        chunks = export_sensor_rows(
+            RDS_POSTGRES_DB, sensor_hub_id, fmt,
+            columns=columns.split(',') if columns else None,
+            start=request.args.get('from'), end=request.args.get('to')
+        )
+        # Start the query now so bad parameters surface as an error response, not a broken stream
+        first_chunk = next(chunks, '')
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+    def generate():
+        yield first_chunk
+        yield from chunks
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={sensor_hub_id}.{fmt}'}
+    )
+
+
+@field_blueprint.route('/ingest-sensor-batch', methods=['POST'])
+def ingest_sensor_batch():
+    """
+    Batch ingestion of sensor readings from hubs.
+    Body is NDJSON (application/x-ndjson, one reading per line) or CSV
+    (text/csv, header row). The format can also be forced with ?format=csv|ndjson.
+    The batch is written before responding (200). Pass ?async=true to only
+    queue it (202): queued rows are not durable until the next flush.
+
+    Sample NDJSON line:
+    {"timestamp": "2025-08-16T10:00:00Z", "sensor_hub_id": "hub_1", "nitrogen_level": 12.5, "temperature": 28.1}
+    """
+    fmt = request.args.get('format')
+    if not fmt:
+        fmt = 'csv' if 'csv' in (request.content_type or '') else 'ndjson'
+
+    try:
+        rows = parse_sensor_payload(request.get_data(as_text=True), fmt)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    if not rows:
+        return jsonify({'success': False, 'message': 'No sensor readings in payload'}), 400
+
+    try:
+        if request.args.get('async', 'false').lower() == 'true':
+            SENSOR_INGEST_BUFFER.add(rows)
+            return jsonify({'success': True, 'stored': False, 'queued': len(rows), 'pending': SENSOR_INGEST_BUFFER.pending()}), 202
+        inserted = SENSOR_INGEST_BUFFER.write(rows)
+        return jsonify({'success': True, 'stored': True, 'accepted': len(rows), 'inserted': inserted}), 200
+    except SensorIngestBufferFull as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 @field_blueprint.route('/get-weather-data-by-hubid', methods=['POST'])
 def get_weather_data_by_hub():
     data = request.get_json()
@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify, request
 from app.service.hello_service import get_hello_message
 from app.mongo.agri_handlers import reset_handlers
+from app.vector_store.models.openai_emb import OPENAI_EMBEDDER
+from app.service.readiness_service import check_readiness
 
 hello_blueprint = Blueprint('hello', __name__)
 
@@ -8,6 +10,22 @@ hello_blueprint = Blueprint('hello', __name__)
 def hello():
     return jsonify(get_hello_message()), 200
 
+@hello_blueprint.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness probe: pings Mongo and Postgres and reports the startup bootstrap.
+    Returns 503 while a backend is unreachable.
+    """
+    status = check_readiness()
+    return jsonify({'success': status['ready'], **status}), 200 if status['ready'] else 503
+
+@hello_blueprint.route('/embedding-cache-stats', methods=['GET'])
+def embedding_cache_stats():
+    """
+    Hit/miss counters of the embedding cache for monitoring.
+    """
+    return jsonify({'success': True, 'stats': OPENAI_EMBEDDER.cache_stats()}), 200
+
 @hello_blueprint.route('/reset-handlers', methods=['POST'])
 def reset():
     """
@@ -70,6 +70,72 @@ def add_service():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@productservice_blueprint.route('/add-products-bulk', methods=['POST'])
+def add_products_bulk():
+    """
+    Sample request JSON:
+    {
+        "products": [ <product JSON as in /add-product>, ... ]
+    }
+    """
+    data = request.get_json()
+    products = data.get('products') if data else None
+    if not products:
+        return jsonify({'success': False, 'message': 'Products are required'}), 400
+    try:
+        validated = [AddProductSchema(**product).dict() for product in products]
+    except ValidationError as e:
+        return jsonify({'success': False, 'errors': e.errors()}), 400
+
+    try:
+        result = AGRI_PRODUCT_HANDLER.add_products(validated)
+        return jsonify({
+            'success': not result['failed'],
+            'message': f"{len(result['inserted'])} products added successfully",
+            'failed': result['failed']
+        }), 201 if result['inserted'] else 409
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@productservice_blueprint.route('/add-services-bulk', methods=['POST'])
+def add_services_bulk():
+    """
+    Sample request JSON:
+    {
+        "services": [ <service JSON as in /add-service>, ... ]
+    }
+    """
+    data = request.get_json()
+    services = data.get('services') if data else None
+    if not services:
+        return jsonify({'success': False, 'message': 'Services are required'}), 400
+    try:
+        validated = [AddServiceSchema(**service).dict() for service in services]
+    except ValidationError as e:
+        return jsonify({'success': False, 'errors': e.errors()}), 400
+
+    try:
+        result = AGRI_SERVICE_HANDLER.add_services(validated)
+        return jsonify({
+            'success': not result['failed'],
+            'message': f"{len(result['inserted'])} services added successfully",
+            'failed': result['failed']
+        }), 201 if result['inserted'] else 409
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@productservice_blueprint.route('/reembed-catalog', methods=['POST'])
+def reembed_catalog():
+    """
+    Recompute the embeddings of every product and service.
+    """
+    try:
+        products = AGRI_PRODUCT_HANDLER.reembed_products()
+        services = AGRI_SERVICE_HANDLER.reembed_services()
+        return jsonify({'success': True, 'products': products, 'services': services}), 200
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @productservice_blueprint.route('/get-product', methods=['POST'])
 def get_product():
     data = request.get_json()
@@ -82,7 +148,6 @@ def get_product():
         # Convert _id to string if necessary
         if isinstance(product, dict) and '_id' in product:
             product['_id'] = str(product['_id'])
-            del product['vector']  # Assuming vector is not needed in the response
         return jsonify({'success': True, 'data': product}), 200
     else:
         return jsonify({'success': False, 'message': 'Product not found'}), 404
@@ -111,7 +176,6 @@ def get_service():
         # Convert _id to string if necessary
         if isinstance(service, dict) and '_id' in service:
             service['_id'] = str(service['_id'])
-            del service['vector']
         return jsonify({'success': True, 'data': service}), 200
     else:
         return jsonify({'success': False, 'message': 'Service not found'}), 404
@@ -138,7 +202,6 @@ def get_all_products():
         for product in products:
             if isinstance(product, dict) and '_id' in product:
                 product['_id'] = str(product['_id'])
-                del product['vector']
         return jsonify({'success': True, 'products': products}), 200
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -153,7 +216,6 @@ def get_all_services():
         for service in services:
             if isinstance(service, dict) and '_id' in service:
                 service['_id'] = str(service['_id'])
-                del service['vector']
         return jsonify({'success': True, 'services': services}), 200
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
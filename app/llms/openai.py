@@ -42,12 +42,22 @@ class LangchainOpenaiJsonEngine:
         self.micro_agent = self.prompt | self.structured_llm
 
     def run(self, query: List[str]):
-        query = "\n".join(query)
+        if not isinstance(query, str):
+            query = "\n".join(query)
         result = self.micro_agent.invoke({
             "query": query
         })
         return [dict(result)]
 
+    def run_batch(self, queries: List[str], max_concurrency: int = 4):
+        """
+        Runs independent queries concurrently (at most `max_concurrency` in
+        flight) and returns one result dict per query, in input order.
+        """
+        inputs = [{"query": query if isinstance(query, str) else "\n".join(query)} for query in queries]
+        results = self.micro_agent.batch(inputs, config={"max_concurrency": max_concurrency})
+        return [dict(result) for result in results]
+
 
 ####################################################################################################
 # The following code is used to generate the function declaration for the LangchainOpenaiSimpleChatEngine class.
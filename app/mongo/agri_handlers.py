@@ -1,15 +1,25 @@
-from sympy import re
-from app.mongo.base_handler import BaseMongoHandler
+from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING, UpdateOne, ReturnDocument
+from app.mongo.base_handler import BaseMongoHandler, EXCLUDE_VECTOR
+from app.utils.lazy import lazy_service
+from app.mongo.dates import timestamp_fields, date_range_query
+from app.vector_store.models.openai_emb import OPENAI_EMBEDDER
+from app.vector_store.vector_index import create_vector_index
 from app.llms.openai import LangchainOpenaiJsonEngine
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
 load_dotenv()
 
 class AgriProductHandler(BaseMongoHandler):
+    indexes = [
+        IndexModel([("product_id", ASCENDING)], name="product_id_unique", unique=True),
+    ]
+    query_shapes = [{"product_id": "product_001"}]
+
     def __init__(self):
-        super().__init__("agri_products")
+        super().__init__("agri_products", vector_index=create_vector_index("agri_products"))
 
     def add_product(self, product):
         """
@@ -39,13 +49,31 @@ class AgriProductHandler(BaseMongoHandler):
             vector_fields=["description", "usage"]
         )
 
-    def get_product_by_id(self, product_id):
-        return self.get_by_id("product_id", product_id)
+    def add_products(self, products):
+        """
+        Bulk-load products; embeddings are generated in batched requests.
+        """
+        return self.add_items(
+            items=products,
+            unique_field="product_id",
+            vector_fields=["description", "usage"]
+        )
+
+    def reembed_products(self):
+        return self.reembed(vector_fields=["description", "usage"])
+
+    def get_product_by_id(self, product_id, projection=EXCLUDE_VECTOR):
+        return self.get_by_id("product_id", product_id, projection)
 
 
 class AgriServiceHandler(BaseMongoHandler):
+    indexes = [
+        IndexModel([("service_id", ASCENDING)], name="service_id_unique", unique=True),
+    ]
+    query_shapes = [{"service_id": "service_001"}]
+
     def __init__(self):
-        super().__init__("agri_services")
+        super().__init__("agri_services", vector_index=create_vector_index("agri_services"))
 
     def add_service(self, service):
         """
@@ -73,8 +101,21 @@ class AgriServiceHandler(BaseMongoHandler):
             vector_fields=["description", "usage"]
         )
 
-    def get_service_by_id(self, service_id):
-        return self.get_by_id("service_id", service_id)
+    def add_services(self, services):
+        """
+        Bulk-load services; embeddings are generated in batched requests.
+        """
+        return self.add_items(
+            items=services,
+            unique_field="service_id",
+            vector_fields=["description", "usage"]
+        )
+
+    def reembed_services(self):
+        return self.reembed(vector_fields=["description", "usage"])
+
+    def get_service_by_id(self, service_id, projection=EXCLUDE_VECTOR):
+        return self.get_by_id("service_id", service_id, projection)
     
 
 
@@ -123,6 +164,20 @@ def format_suggestions(suggestions):
 
 
 class ProductServiceSuggestionHandler(BaseMongoHandler):
+    indexes = [
+        # Not unique: re-running suggest_for_date for the same hub and date
+        # stores a new suggestion under the same suggestion_id.
+        IndexModel([("suggestion_id", ASCENDING)], name="suggestion_id"),
+        IndexModel([("sensor_hub_id", ASCENDING), ("timestamp_dt", ASCENDING)], name="sensor_hub_id_timestamp_dt"),
+        IndexModel([("timestamp_dt", ASCENDING)], name="timestamp_dt"),
+    ]
+    query_shapes = [
+        {"suggestion_id": "suggestion_hub_001_2025-01-01"},
+        {"sensor_hub_id": "hub_001"},
+        {"sensor_hub_id": {"$in": ["hub_001", "hub_002"]}},
+        date_range_query("2025-01-01"),
+    ]
+
     def __init__(self):
         super().__init__("product_service_suggestions")
 
@@ -148,6 +203,8 @@ class ProductServiceSuggestionHandler(BaseMongoHandler):
                 "timestamp": suggestions.get('timestamp', ''),
                 "delivery_status": "pending"  # [ 'pending', 'wap', 'mail' , 'wap+mail']
             }
+            if payload["timestamp"]:
+                payload.update(timestamp_fields(payload["timestamp"]))
             return self.add_item(
                 item=payload,
                 unique_field="suggestion_id"
@@ -167,6 +224,20 @@ class ProductServiceSuggestionHandler(BaseMongoHandler):
             {"$set": {"delivery_status": delivery_status}}
         )
         return result.modified_count > 0
+
+    def get_suggestions_by_date(self, start, end=None, sensor_hub_id=None, projection=EXCLUDE_VECTOR):
+        """
+        Get suggestions whose timestamp falls in the given date range.
+
+        Args:
+            start: First day (or "YYYY-MM" month / "YYYY" year) of the range.
+            end: Optional last day of the range (inclusive).
+            sensor_hub_id (str): Optional hub filter.
+        """
+        query = date_range_query(start, end)
+        if sensor_hub_id:
+            query["sensor_hub_id"] = sensor_hub_id
+        return list(self.collection.find(query, projection))
             
     
 
@@ -179,6 +250,21 @@ class IsValidCombination(BaseModel):
     reason: str = Field(title="Reason", description="Explanation of why the combination is valid or not.")
 
 class AlertStorageHandler(BaseMongoHandler):
+    indexes = [
+        IndexModel([("alert_id", ASCENDING)], name="alert_id_unique", unique=True),
+        # Equality fields first, then the date range (generate_requirement)
+        IndexModel([("sensor_hub_id", ASCENDING), ("action_severity", ASCENDING), ("timestamp_dt", ASCENDING)],
+                   name="sensor_hub_id_action_severity_timestamp_dt"),
+        IndexModel([("timestamp_dt", ASCENDING)], name="timestamp_dt"),
+    ]
+    query_shapes = [
+        {"alert_id": "alert_001"},
+        {"sensor_hub_id": "hub_001"},
+        {"sensor_hub_id": {"$in": ["hub_001", "hub_002"]}},
+        {**date_range_query("2025-01-01"), "action_severity": {"$in": ["high", "critical"]}, "sensor_hub_id": "hub_001"},
+        date_range_query("2025-01-01"),
+    ]
+
     def __init__(self, model_name="gpt-4o-mini", temperature=0.5, 
                  product_handler: AgriProductHandler = None, 
                  service_handler: AgriServiceHandler = None,
@@ -242,6 +328,7 @@ Instructions:
         """
         alert = {
             **alert,
+            **(timestamp_fields(alert["timestamp"]) if alert.get("timestamp") else {}),
             "delivery_status": "pending",  # [ 'pending', 'wap', 'mail' , 'wap+mail']
             "comments": [],
             "resolved": False
@@ -252,22 +339,60 @@ Instructions:
             vector_fields=["action_body"]
         )
 
-    def get_alert_by_id(self, alert_id):
-        return self.get_by_id("alert_id", alert_id)
+    def add_alerts(self, alerts):
+        """
+        Add several alerts at once. All action bodies are embedded in one
+        batched request and the alerts are written with one unordered insert_many.
+
+        Returns:
+            dict: {"inserted": [alerts], "failed": [{"index", "alert_id", "error"}]}
+        """
+        alerts = [{
+            **alert,
+            **(timestamp_fields(alert["timestamp"]) if alert.get("timestamp") else {}),
+            "delivery_status": "pending",  # [ 'pending', 'wap', 'mail' , 'wap+mail']
+            "comments": [],
+            "resolved": False
+        } for alert in alerts]
+        return self.add_items(
+            items=alerts,
+            unique_field="alert_id",
+            vector_fields=["action_body"]
+        )
+
+    def get_alert_by_id(self, alert_id, projection=EXCLUDE_VECTOR):
+        return self.get_by_id("alert_id", alert_id, projection)
     
-    def get_alerts_by_hub_id(self, sensor_hub_id):
+    def get_alerts_by_hub_id(self, sensor_hub_id, projection=EXCLUDE_VECTOR):
         """
         Get all alerts for a given sensor_hub_id.
         """
-        return list(self.collection.find({"sensor_hub_id": sensor_hub_id}))
+        return list(self.collection.find({"sensor_hub_id": sensor_hub_id}, projection))
     
-    def get_alerts_by_hub_ids(self, sensor_hub_ids: List[str]):
+    def get_alerts_by_hub_ids(self, sensor_hub_ids: List[str], projection=EXCLUDE_VECTOR):
         """
         Get all alerts for a list of sensor_hub_ids.
         """
         if not sensor_hub_ids:
             return []
-        return list(self.collection.find({"sensor_hub_id": {"$in": sensor_hub_ids}}))
+        return list(self.collection.find({"sensor_hub_id": {"$in": sensor_hub_ids}}, projection))
+
+    def get_alerts_by_date(self, start, end=None, sensor_hub_id=None, severities=None, projection=EXCLUDE_VECTOR):
+        """
+        Get alerts whose timestamp falls in the given date range.
+
+        Args:
+            start: First day (or "YYYY-MM" month / "YYYY" year) of the range.
+            end: Optional last day of the range (inclusive).
+            sensor_hub_id (str): Optional hub filter.
+            severities (list): Optional action_severity values to keep.
+        """
+        query = date_range_query(start, end)
+        if sensor_hub_id:
+            query["sensor_hub_id"] = sensor_hub_id
+        if severities:
+            query["action_severity"] = {"$in": list(severities)}
+        return list(self.collection.find(query, projection))
     
     def update_delivery_status(self, alert_id: str, delivery_status: str):
         """
@@ -313,13 +438,12 @@ Instructions:
         Step 3: Generate a product requirement based on the analysis
         Step 4: Return the service requirement based on the analysis
         """
-        alerts = self.collection.find({
-            "timestamp": {"$regex": f"^{date}"},
-            "action_severity": {"$in": ["high", "critical"]},
-            "sensor_hub_id": sensor_hub_id
-        })
-        
-        alerts_list = list(alerts)
+        alerts_list = self.get_alerts_by_date(
+            date,
+            sensor_hub_id=sensor_hub_id,
+            severities=["high", "critical"],
+            projection={"action_body": 1}
+        )
         if not alerts_list:
             return dict(BaseRequirements(product_requirements=[], service_requirements=[]))
         prompt = self._generate_input_prompt(alerts_list)
@@ -361,11 +485,17 @@ Instructions:
         # print(f"Generated Requirements for {date}: {requirements}")
         product_suggestions = []
         service_suggestions = []
-        if requirements.get('product_requirements'):
-            for req in requirements['product_requirements']:
-                # print(f"Searching for products matching requirement: {req}")
-                products = self.product_handler.search(req, vector_field='vector')
-                product_suggestions.extend(products[:1])
+        product_requirements = requirements.get('product_requirements') or []
+        service_requirements = requirements.get('service_requirements') or []
+        # Embed every product and service requirement in one request
+        requirement_vectors = OPENAI_EMBEDDER(product_requirements + service_requirements) \
+            if product_requirements or service_requirements else []
+        product_vectors = requirement_vectors[:len(product_requirements)]
+        service_vectors = requirement_vectors[len(product_requirements):]
+
+        if product_requirements:
+            for products in self.product_handler.search_many_by_vectors(product_vectors, top_k=1, vector_field='vector'):
+                product_suggestions.extend(products)
 
         print(f"[PRODUCT] Before filtering, found {len(product_suggestions)} product suggestions for date {date}.")
         filtered_product_suggestions = self.validate_combination(
@@ -374,11 +504,9 @@ Instructions:
         )
         print(f"[PRODUCT] After filtering, found {len(filtered_product_suggestions)} valid product suggestions for date {date}.")
 
-        if requirements.get('service_requirements'):
-            for req in requirements['service_requirements']:
-                # print(f"Searching for services matching requirement: {req}")
-                services = self.service_handler.search(req, vector_field='vector')
-                service_suggestions.extend(services[:1])
+        if service_requirements:
+            for services in self.service_handler.search_many_by_vectors(service_vectors, top_k=1, vector_field='vector'):
+                service_suggestions.extend(services)
 
         print(f"[SERVICE] Before filtering, found {len(service_suggestions)} service suggestions for date {date}.")
         filtered_service_suggestions = self.validate_combination(
@@ -403,6 +531,11 @@ Instructions:
 
 
 class UserHandler(BaseMongoHandler):
+    indexes = [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ]
+    query_shapes = [{"user_id": "user_001"}]
+
     def __init__(self):
         super().__init__("users")
 
@@ -429,6 +562,11 @@ class UserHandler(BaseMongoHandler):
 
 
 class WeatherHandler(BaseMongoHandler):
+    indexes = [
+        IndexModel([("latitude_longitude_date", ASCENDING)], name="latitude_longitude_date_unique", unique=True),
+    ]
+    query_shapes = [{"latitude_longitude_date": "12_98_2025-01-01"}]
+
     def __init__(self):
         super().__init__("weather")
 
@@ -472,6 +610,17 @@ class WeatherHandler(BaseMongoHandler):
     
 
 class FieldHandler(BaseMongoHandler):
+    indexes = [
+        IndexModel([("field_id", ASCENDING)], name="field_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        IndexModel([("sensor_hub_id", ASCENDING)], name="sensor_hub_id"),
+    ]
+    query_shapes = [
+        {"field_id": "field_001"},
+        {"user_id": "user_001"},
+        {"sensor_hub_id": "hub_001"},
+    ]
+
     def __init__(self, user_handler: UserHandler = None):
         super().__init__("fields")
         self.user_handler = user_handler
@@ -504,23 +653,23 @@ class FieldHandler(BaseMongoHandler):
             unique_field="field_id"
         )
     
-    def get_fields_by_user_id(self, user_id):
+    def get_fields_by_user_id(self, user_id, projection=EXCLUDE_VECTOR):
         """
         Get all fields for a given user_id.
         """
-        return list(self.collection.find({"user_id": user_id}))
+        return list(self.collection.find({"user_id": user_id}, projection))
 
-    def get_fields_by_hub_id(self, sensor_hub_id):
+    def get_fields_by_hub_id(self, sensor_hub_id, projection=EXCLUDE_VECTOR):
         """
         Get all fields for a given sensor_hub_id.
         """
-        return list(self.collection.find({"sensor_hub_id": sensor_hub_id}))
+        return list(self.collection.find({"sensor_hub_id": sensor_hub_id}, projection))
 
     def get_user_by_field_id(self, field_id):
         """
         Get user_id for a given field_id.
         """
-        field = self.collection.find_one({"field_id": field_id})
+        field = self.collection.find_one({"field_id": field_id}, {"user_id": 1})
         if field and self.user_handler:
             return self.user_handler.get_by_id("user_id", field.get("user_id"))
         return None
@@ -529,7 +678,7 @@ class FieldHandler(BaseMongoHandler):
         """
         Get user_id for a given sensor_hub_id.
         """
-        field = self.collection.find_one({"sensor_hub_id": sensor_hub_id})
+        field = self.collection.find_one({"sensor_hub_id": sensor_hub_id}, {"user_id": 1})
         if field and self.user_handler:
             return self.user_handler.get_by_id("user_id", field.get("user_id"))
         return None
@@ -546,18 +695,396 @@ class FieldHandler(BaseMongoHandler):
         return True
 
 
-# Handlers
-AGRI_PRODUCT_HANDLER = AgriProductHandler()
-AGRI_SERVICE_HANDLER = AgriServiceHandler()
-AGRI_PRODUCT_SERVICE_SUGGESTION_HANDLER = ProductServiceSuggestionHandler()
-ALERT_STORAGE_HANDLER = AlertStorageHandler(
+class SqlPlanCacheHandler(BaseMongoHandler):
+    indexes = [
+        IndexModel([("plan_key", ASCENDING)], name="plan_key_unique", unique=True),
+        # Mongo removes plans once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]
+    query_shapes = [{"plan_key": "0" * 64}]
+
+    def __init__(self):
+        super().__init__("sql_plan_cache")
+
+    def get_plan(self, plan_key):
+        """
+        Get the cached sub-query/SQL plan for a plan key.
+        The TTL monitor only runs about once a minute, so expiry is also checked here.
+
+        Returns:
+            list: Plan steps, or None if not cached or expired.
+        """
+        doc = self.collection.find_one(
+            {"plan_key": plan_key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"steps": 1}
+        )
+        return doc["steps"] if doc else None
+
+    def save_plan(self, plan_key, steps, ttl_seconds, meta=None):
+        """
+        Store a plan for `ttl_seconds`. Upserted so workers generating the same plan concurrently don't conflict.
+        Sample Step:
+        {
+            "option_index": 0,
+            "subquery": "Find the min, max and average temperature",
+            "sql_code": "SELECT ... FROM arduino_data WHERE sensor_hub_id = :sensor_hub_id ..."
+        }
+        """
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"plan_key": plan_key},
+            {"$set": {
+                **(meta or {}),
+                "plan_key": plan_key,
+                "steps": steps,
+                "created_at": now.isoformat(),
+                "expires_at": now + timedelta(seconds=ttl_seconds)
+            }},
+            upsert=True
+        )
+
+    def delete_plan(self, plan_key):
+        return self.delete_by_id("plan_key", plan_key)
+
+
+class CropRequirementsCacheHandler(BaseMongoHandler):
+    indexes = [
+        IndexModel([("cache_key", ASCENDING)], name="cache_key_unique", unique=True),
+        # Mongo removes entries once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]
+    query_shapes = [{"cache_key": "rice|12.5|98.5|October|gpt-4o-mini"}]
+
+    def __init__(self):
+        super().__init__("crop_requirements_cache")
+
+    def get_requirements(self, cache_key):
+        """
+        Get cached crop requirements for a cache key.
+        The TTL monitor only runs about once a minute, so expiry is also checked here.
+
+        Returns:
+            dict: Requirements, or None if not cached or expired.
+        """
+        doc = self.collection.find_one(
+            {"cache_key": cache_key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"requirements": 1}
+        )
+        return doc["requirements"] if doc else None
+
+    def save_requirements(self, cache_key, requirements, ttl_seconds, meta=None):
+        """
+        Store crop requirements for `ttl_seconds`. Upserted so concurrent triggers don't conflict.
+        Sample Entry:
+        {
+            "cache_key": "rice|12.5|98.5|October|gpt-4o-mini",
+            "crop_type": "rice",
+            "latitude": 12.5,
+            "longitude": 98.5,
+            "month": "October",
+            "model_name": "gpt-4o-mini",
+            "address": "...",
+            "requirements": {"nuturient_requirements": "...", ...},
+            "expires_at": datetime
+        }
+        """
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"cache_key": cache_key},
+            {"$set": {
+                **(meta or {}),
+                "cache_key": cache_key,
+                "requirements": requirements,
+                "created_at": now.isoformat(),
+                "expires_at": now + timedelta(seconds=ttl_seconds)
+            }},
+            upsert=True
+        )
+
+
+class GeocodeCacheHandler(BaseMongoHandler):
+    indexes = [
+        IndexModel([("cell_key", ASCENDING)], name="cell_key_unique", unique=True),
+    ]
+    query_shapes = [{"cell_key": "nominatim|12.35|98.77"}]
+
+    def __init__(self):
+        super().__init__("geocode_cache")
+
+    def get_address(self, cell_key):
+        """
+        Get the cached address of a rounded-coordinate cell.
+
+        Returns:
+            str: Address, or None if not cached.
+        """
+        doc = self.collection.find_one({"cell_key": cell_key}, {"address": 1})
+        return doc["address"] if doc else None
+
+    def save_address(self, cell_key, address, meta=None):
+        """
+        Store the address of a cell. Upserted so concurrent lookups don't conflict.
+        Sample Entry:
+        {
+            "cell_key": "nominatim|12.35|98.77",
+            "latitude": 12.35,
+            "longitude": 98.77,
+            "backend": "nominatim",
+            "address": "Mergui, Tanintharyi Region, Myanmar"
+        }
+        """
+        self.collection.update_one(
+            {"cell_key": cell_key},
+            {"$set": {
+                **(meta or {}),
+                "cell_key": cell_key,
+                "address": address,
+                "created_at": datetime.utcnow().isoformat()
+            }},
+            upsert=True
+        )
+
+
+class RateLimitHandler(BaseMongoHandler):
+    # Documents are keyed by limiter name (_id), no extra index needed
+
+    def __init__(self):
+        super().__init__("rate_limits")
+
+    def reserve_slot(self, name, interval_seconds):
+        """
+        Atomically reserves the next free call slot of a shared limiter, at
+        least `interval_seconds` after the previous one. Times come from the
+        server clock ($$NOW) so hosts with skewed clocks still agree.
+
+        Returns:
+            float: Seconds to wait before the reserved slot.
+        """
+        interval_ms = int(interval_seconds * 1000)
+        doc = self.collection.find_one_and_update(
+            {"_id": name},
+            [{"$set": {
+                "now_ms": {"$toLong": "$$NOW"},
+                "next_ms": {"$add": [
+                    {"$max": [{"$ifNull": ["$next_ms", 0]}, {"$toLong": "$$NOW"}]},
+                    interval_ms
+                ]},
+            }}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return max(doc["next_ms"] - interval_ms - doc["now_ms"], 0) / 1000
+
+
+class FleetRunHandler(BaseMongoHandler):
+    indexes = [
+        IndexModel([("run_id", ASCENDING)], name="run_id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ]
+    query_shapes = [{"run_id": "fleet_2025-01-01T00-00-00"}]
+
+    def __init__(self):
+        super().__init__("fleet_runs")
+
+    def create_run(self, run_id, meta=None):
+        """
+        Create a fleet run.
+        Sample Run:
+        {
+            "run_id": "fleet_2025-01-01T00-00-00",
+            "status": "created",   # created | running | done | partial | failed
+            "days": 7,
+            "total_hubs": 1200,
+            "weather_cells": 85,
+            "crop_keys": 40,
+            "created_at": "...",
+            "started_at": "...",
+            "finished_at": "..."
+        }
+        """
+        run = {
+            **(meta or {}),
+            "run_id": run_id,
+            "status": "created",
+            "created_at": datetime.utcnow().isoformat()
+        }
+        return self.add_item(item=run, unique_field="run_id")
+
+    def update_run(self, run_id, update_fields):
+        return self.update_by_id("run_id", run_id, update_fields)
+
+    def get_latest_run(self):
+        return self.collection.find_one({}, EXCLUDE_VECTOR, sort=[("created_at", DESCENDING)])
+
+
+class FleetRunItemHandler(BaseMongoHandler):
+    indexes = [
+        IndexModel([("run_id", ASCENDING), ("sensor_hub_id", ASCENDING)], name="run_id_sensor_hub_id_unique", unique=True),
+        IndexModel([("run_id", ASCENDING), ("status", ASCENDING)], name="run_id_status"),
+    ]
+    query_shapes = [
+        {"run_id": "fleet_2025-01-01T00-00-00", "sensor_hub_id": "hub_001"},
+        {"run_id": "fleet_2025-01-01T00-00-00", "status": {"$nin": ["done", "partial"]}},
+    ]
+
+    def __init__(self):
+        super().__init__("fleet_run_items")
+
+    def add_run_items(self, run_id, items):
+        """
+        Register the hubs of a run as pending. Re-adding a hub is a no-op,
+        so an interrupted enumeration can simply be repeated.
+        Sample Item:
+        {
+            "run_id": "fleet_2025-01-01T00-00-00",
+            "sensor_hub_id": "hub_001",
+            "latitude": 12.345678,
+            "longitude": 98.765432,
+            "crop_type": "rice",
+            "status": "pending",   # pending | running | done | partial | failed
+            "failed_stages": [],   # pipeline stages that fell back (partial/failed)
+            "attempts": 0,
+            "seconds": 12.3,
+            "alerts": 5,
+            "error": None
+        }
+        """
+        if not items:
+            return 0
+        result = self.collection.bulk_write([
+            UpdateOne(
+                {"run_id": run_id, "sensor_hub_id": item["sensor_hub_id"]},
+                {"$setOnInsert": {**item, "run_id": run_id, "status": "pending", "attempts": 0}},
+                upsert=True
+            )
+            for item in items
+        ], ordered=False)
+        return result.upserted_count
+
+    def get_unfinished_items(self, run_id, max_attempts):
+        """
+        Items still to process: not finished (done or partial) and tried fewer
+        than `max_attempts` times.
+        """
+        return list(self.collection.find(
+            {"run_id": run_id, "status": {"$nin": ["done", "partial"]}, "attempts": {"$lt": max_attempts}},
+            {"_id": 0}
+        ))
+
+    def claim_item(self, run_id, sensor_hub_id, max_attempts, lease_seconds):
+        """
+        Atomically claims a hub for processing, so concurrent runners (API
+        thread, CLI, other workers) never process it twice. Pending and failed
+        items can be claimed, as can running items whose lease expired
+        (their runner died).
+
+        Returns:
+            str: A claim id to pass to mark_item, or None if the item is not claimable.
+        """
+        now = datetime.utcnow()
+        claim_id = str(ObjectId())
+        claimed = self.collection.find_one_and_update(
+            {
+                "run_id": run_id,
+                "sensor_hub_id": sensor_hub_id,
+                "attempts": {"$lt": max_attempts},
+                "$or": [
+                    {"status": {"$in": ["pending", "failed"]}},
+                    {"status": "running", "lease_expires_at": {"$lt": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "claim_id": claim_id,
+                    "started_at": now.isoformat(),
+                    "updated_at": now.isoformat(),
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                },
+                "$inc": {"attempts": 1},
+            },
+            projection={"_id": 1}
+        )
+        return claim_id if claimed else None
+
+    def mark_item(self, run_id, sensor_hub_id, status, fields=None, claim_id=None):
+        """
+        Set the status of an item. With `claim_id`, only if the claim is still
+        held (a runner whose lease expired can't overwrite its successor).
+        """
+        query = {"run_id": run_id, "sensor_hub_id": sensor_hub_id}
+        if claim_id:
+            query["claim_id"] = claim_id
+        self.collection.update_one(query, {"$set": {**(fields or {}), "status": status, "updated_at": datetime.utcnow().isoformat()}})
+
+    def run_summary(self, run_id, failures_limit=20):
+        """
+        Item counts per status, processing time stats of finished hubs and the
+        latest failed or partial hubs of a run.
+        """
+        counts = {"pending": 0, "running": 0, "done": 0, "partial": 0, "failed": 0}
+        summary = {"counts": counts, "hub_seconds_avg": None, "hub_seconds_max": None, "alerts": 0}
+        finished = []
+        for group in self.collection.aggregate([
+            {"$match": {"run_id": run_id}},
+            {"$group": {
+                "_id": "$status",
+                "count": {"$sum": 1},
+                "seconds_avg": {"$avg": "$seconds"},
+                "seconds_max": {"$max": "$seconds"},
+                "alerts": {"$sum": {"$ifNull": ["$alerts", 0]}},
+            }},
+        ]):
+            counts[group["_id"]] = group["count"]
+            if group["_id"] in ("done", "partial"):
+                finished.append(group)
+        if finished:
+            count = sum(group["count"] for group in finished)
+            summary["hub_seconds_avg"] = sum((group["seconds_avg"] or 0) * group["count"] for group in finished) / count
+            summary["hub_seconds_max"] = max(group["seconds_max"] or 0 for group in finished)
+            summary["alerts"] = sum(group["alerts"] for group in finished)
+        # limit(0) would mean no limit
+        summary["failures"] = list(self.collection.find(
+            {"run_id": run_id, "status": {"$in": ["failed", "partial"]}},
+            {"_id": 0, "sensor_hub_id": 1, "status": 1, "error": 1, "failed_stages": 1, "attempts": 1, "updated_at": 1}
+        ).sort("updated_at", DESCENDING).limit(failures_limit)) if failures_limit else []
+        return summary
+
+
+# Handlers (created on first use)
+AGRI_PRODUCT_HANDLER = lazy_service("product_handler", AgriProductHandler)
+AGRI_SERVICE_HANDLER = lazy_service("service_handler", AgriServiceHandler)
+AGRI_PRODUCT_SERVICE_SUGGESTION_HANDLER = lazy_service("suggestion_handler", ProductServiceSuggestionHandler)
+ALERT_STORAGE_HANDLER = lazy_service("alert_handler", lambda: AlertStorageHandler(
     product_handler=AGRI_PRODUCT_HANDLER,
     service_handler=AGRI_SERVICE_HANDLER,
     product_service_suggestion_handler=AGRI_PRODUCT_SERVICE_SUGGESTION_HANDLER
-)
-USER_HANDLER = UserHandler()
-WEATHER_HANDLER = WeatherHandler()
-FIELD_HANDLER = FieldHandler(user_handler=USER_HANDLER)
+))
+USER_HANDLER = lazy_service("user_handler", UserHandler)
+WEATHER_HANDLER = lazy_service("weather_handler", WeatherHandler)
+FIELD_HANDLER = lazy_service("field_handler", lambda: FieldHandler(user_handler=USER_HANDLER))
+SQL_PLAN_CACHE_HANDLER = lazy_service("sql_plan_cache_handler", SqlPlanCacheHandler)
+CROP_REQUIREMENTS_CACHE_HANDLER = lazy_service("crop_requirements_cache_handler", CropRequirementsCacheHandler)
+GEOCODE_CACHE_HANDLER = lazy_service("geocode_cache_handler", GeocodeCacheHandler)
+RATE_LIMIT_HANDLER = lazy_service("rate_limit_handler", RateLimitHandler)
+FLEET_RUN_HANDLER = lazy_service("fleet_run_handler", FleetRunHandler)
+FLEET_RUN_ITEM_HANDLER = lazy_service("fleet_run_item_handler", FleetRunItemHandler)
+
+ALL_HANDLERS = {
+    'product': AGRI_PRODUCT_HANDLER,
+    'service': AGRI_SERVICE_HANDLER,
+    'suggestion': AGRI_PRODUCT_SERVICE_SUGGESTION_HANDLER,
+    'alert': ALERT_STORAGE_HANDLER,
+    'user': USER_HANDLER,
+    'weather': WEATHER_HANDLER,
+    'field': FIELD_HANDLER,
+    'sql_plan_cache': SQL_PLAN_CACHE_HANDLER,
+    'crop_requirements_cache': CROP_REQUIREMENTS_CACHE_HANDLER,
+    'geocode_cache': GEOCODE_CACHE_HANDLER,
+    'rate_limit': RATE_LIMIT_HANDLER,
+    'fleet_run': FLEET_RUN_HANDLER,
+    'fleet_run_item': FLEET_RUN_ITEM_HANDLER,
+}
 
 
 def reset_handlers(exclusions=[]):
@@ -585,4 +1112,22 @@ def reset_handlers(exclusions=[]):
         WEATHER_HANDLER.delete_all()
     if 'field' not in exclusions:
         print("Resetting FieldHandler...")
-        FIELD_HANDLER.delete_all()
\ No newline at end of file
+        FIELD_HANDLER.delete_all()
+    if 'sql_plan_cache' not in exclusions:
+        print("Resetting SqlPlanCacheHandler...")
+        SQL_PLAN_CACHE_HANDLER.delete_all()
+    if 'crop_requirements_cache' not in exclusions:
+        print("Resetting CropRequirementsCacheHandler...")
+        CROP_REQUIREMENTS_CACHE_HANDLER.delete_all()
+    if 'geocode_cache' not in exclusions:
+        print("Resetting GeocodeCacheHandler...")
+        GEOCODE_CACHE_HANDLER.delete_all()
+    if 'rate_limit' not in exclusions:
+        print("Resetting RateLimitHandler...")
+        RATE_LIMIT_HANDLER.delete_all()
+    if 'fleet_run' not in exclusions:
+        print("Resetting FleetRunHandler...")
+        FLEET_RUN_HANDLER.delete_all()
+    if 'fleet_run_item' not in exclusions:
+        print("Resetting FleetRunItemHandler...")
+        FLEET_RUN_ITEM_HANDLER.delete_all()
\ No newline at end of file
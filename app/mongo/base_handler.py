@@ -1,20 +1,200 @@
-from pymongo import MongoClient
+import time
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from bson import ObjectId
 from app.vector_store.models.openai_emb import OPENAI_EMBEDDER
-from sklearn.metrics.pairwise import cosine_similarity
+from app.vector_store.vector_index import BaseVectorIndex, MatrixVectorIndex
+from app.mongo.client import get_mongo_client
 import numpy as np
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
 
+# Collection holding a write counter per indexed collection, so that every
+# process can tell when its in-memory vector index is stale.
+COLLECTION_VERSIONS = "collection_versions"
+
+# Default projection of read paths. Embeddings are ~12KB per document and only
+# needed for search, so they are not loaded unless explicitly requested.
+EXCLUDE_VECTOR = {"vector": 0}
+
+
+def _plan_stages(plan):
+    """Yields every `stage` name found in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
 
 
 class BaseMongoHandler:
-    def __init__(self, collection_name):
-        self.client = MongoClient(os.environ['MONGO_DB_URI'])
+    vector_index_refresh_seconds = float(os.getenv("VECTOR_INDEX_REFRESH_SECONDS", "30"))
+    # Declarative index spec (list of pymongo IndexModel) applied by ensure_indexes()
+    indexes = []
+    # Representative filters of the handler's hot queries, checked by collscan_report()
+    query_shapes = []
+
+    def __init__(self, collection_name, vector_index: BaseVectorIndex = None, index_vector_field='vector'):
         self.db_name = "capital_one_db"
-        self.db = self.client[self.db_name]
-        self.collection = self.db[collection_name]
+        self.collection_name = collection_name
+        # Optional ANN index mirroring `index_vector_field`, kept in sync on writes
+        self.vector_index = vector_index
+        self.index_vector_field = index_vector_field
+
+    @property
+    def client(self):
+        # Resolved on every access so handlers follow the per-process client after a fork
+        return get_mongo_client()
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    @property
+    def collection(self):
+        return self.db[self.collection_name]
+
+    def _collection_version(self):
+        doc = self.db[COLLECTION_VERSIONS].find_one({"_id": self.collection_name})
+        return doc["version"] if doc else 0
+
+    def _bump_collection_version(self, count=1):
+        """
+        Increments the collection version by `count` (one per changed item)
+        after a write that touched the vector index.
+        """
+        index = self.vector_index
+        if index is None or not index.process_local:
+            return
+        doc = self.db[COLLECTION_VERSIONS].find_one_and_update(
+            {"_id": self.collection_name},
+            {"$inc": {"version": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        with index.lock:
+            if index.version == doc["version"] - count:
+                # Only our own write happened since the last sync, already applied in place
+                index.version = doc["version"]
+            else:
+                index.is_built = False
+
+    def _vector_index_is_stale(self):
+        index = self.vector_index
+        if not index.process_local:
+            return False
+        now = time.monotonic()
+        if now - index.checked_at < self.vector_index_refresh_seconds:
+            return False
+        index.checked_at = now
+        return self._collection_version() != index.version
+
+    def _ensure_vector_index(self):
+        """
+        Lazily builds the vector index from the collection on first use and
+        rebuilds it when another process has changed the collection.
+        """
+        index = self.vector_index
+        if index.is_built and not self._vector_index_is_stale():
+            return
+        with index.lock:
+            if index.is_built and index.version == self._collection_version():
+                return
+            # Read the version first so a concurrent write triggers another refresh
+            version = self._collection_version()
+            field = self.index_vector_field
+            if not index.process_local and not index.is_built:
+                # Persistent backends only need loading when they are out of sync with Mongo
+                if not index.needs_build(self.collection.count_documents({field: {"$exists": True}})):
+                    index.is_built = True
+                    index.version = version
+                    return
+            docs = self.collection.find({field: {"$exists": True}}, {field: 1})
+            index.build((str(doc["_id"]), doc[field]) for doc in docs)
+            index.version = version
+            index.checked_at = time.monotonic()
+
+    def _index_add(self, item):
+        self._index_add_many([item])
+
+    def _index_add_many(self, items):
+        """
+        Adds written items to the vector index under one lock and bumps the
+        collection version once for the whole batch.
+        """
+        if self.vector_index is None:
+            return
+        items = [item for item in items if self.index_vector_field in item]
+        if not items:
+            return
+        with self.vector_index.lock:
+            if self._writes_through():
+                self.vector_index.add_many((str(item["_id"]), item[self.index_vector_field]) for item in items)
+        self._bump_collection_version(len(items))
+
+    def _index_remove(self, ids):
+        if self.vector_index is None:
+            return
+        with self.vector_index.lock:
+            if self._writes_through():
+                for _id in ids:
+                    self.vector_index.remove(str(_id))
+        self._bump_collection_version(len(ids))
+
+    def _writes_through(self):
+        # An unbuilt in-process index picks the items up from Mongo when it is built.
+        # Persistent backends are shared and may already hold the data, so every
+        # write goes to them: the count check in needs_build cannot spot a stale vector.
+        return self.vector_index.is_built or not self.vector_index.process_local
+
+    def ensure_indexes(self):
+        """
+        Creates the indexes declared in `indexes`. Safe to run repeatedly:
+        existing identical indexes are left untouched.
+
+        Returns:
+            dict: Index names created or confirmed, and errors per index.
+        """
+        report = {"collection": self.collection_name, "created": [], "errors": {}}
+        for model in self.indexes:
+            name = model.document["name"]
+            try:
+                report["created"].extend(self.collection.create_indexes([model]))
+            except OperationFailure as e:
+                # e.g. a unique index over existing duplicates; keep bootstrapping the rest
+                report["errors"][name] = str(e)
+        return report
+
+    def collscan_report(self):
+        """
+        Explains every query in `query_shapes` and reports the ones whose
+        winning plan still scans the whole collection.
+
+        Returns:
+            list: {"collection", "filter", "stages"} for each COLLSCAN query.
+        """
+        collscans = []
+        for query in self.query_shapes:
+            plan = self.collection.find(query).explain().get("queryPlanner", {}).get("winningPlan", {})
+            stages = list(_plan_stages(plan))
+            if "COLLSCAN" in stages:
+                collscans.append({"collection": self.collection_name, "filter": query, "stages": stages})
+        return collscans
+
+    def _fetch_ranked(self, hits, projection=EXCLUDE_VECTOR):
+        """
+        Loads the documents for (item_id, similarity) index hits, keeping the hit order.
+        """
+        if not hits:
+            return []
+        ids = [ObjectId(item_id) if ObjectId.is_valid(item_id) else item_id for item_id, _ in hits]
+        docs = {str(doc["_id"]): doc for doc in self.collection.find({"_id": {"$in": ids}}, projection)}
+        return [docs[item_id] for item_id, _ in hits if item_id in docs]
 
     def add_item(self, item, unique_field, vector_fields=None):
         """
@@ -25,38 +205,127 @@ class BaseMongoHandler:
             unique_field (str): Field name that must be unique.
             vector_fields (list): List of text fields to combine for embedding.
         """
-        # if self.collection.find_one({unique_field: item[unique_field]}):
-        #     raise ValueError(f"Item with {unique_field} '{item[unique_field]}' already exists.")
-
         if vector_fields:
-            combined_text = " ".join(item[field] for field in vector_fields if field in item)
+            combined_text = self._combined_text(item, vector_fields)
             item_vector = OPENAI_EMBEDDER(combined_text).tolist()
             item['vector'] = item_vector
 
-        self.collection.insert_one(item)
+        # Uniqueness is enforced by the unique indexes declared in `indexes`
+        try:
+            self.collection.insert_one(item)
+        except DuplicateKeyError:
+            raise ValueError(f"Item with {unique_field} '{item.get(unique_field)}' already exists.")
+        self._index_add(item)
         return item
 
-    def get_by_id(self, unique_field, value):
-        return self.collection.find_one({unique_field: value})
+    def _combined_text(self, item, vector_fields):
+        return " ".join(item[field] for field in vector_fields if field in item)
+
+    def add_items(self, items, unique_field, vector_fields=None):
+        """
+        Adds several items at once. Embeddings for all items are generated
+        through one batched embedding call and the items are written with
+        a single unordered insert_many, so one bad item doesn't stop the rest.
 
-    def get_all(self):
-        return list(self.collection.find())
+        Args:
+            items (list): The items to add.
+            unique_field (str): Field name that must be unique.
+            vector_fields (list): List of text fields to combine for embedding.
+
+        Returns:
+            dict: {"inserted": [items], "failed": [{"index", unique_field, "error"}]}
+        """
+        if not items:
+            return {"inserted": [], "failed": []}
+        if vector_fields:
+            vectors = OPENAI_EMBEDDER([self._combined_text(item, vector_fields) for item in items])
+            for item, vector in zip(items, vectors):
+                item['vector'] = vector.tolist()
+
+        failed = []
+        try:
+            self.collection.insert_many(items, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                item = items[error["index"]]
+                message = error.get("errmsg", "")
+                if error.get("code") == 11000:
+                    message = f"Item with {unique_field} '{item.get(unique_field)}' already exists."
+                failed.append({"index": error["index"], unique_field: item.get(unique_field), "error": message})
+
+        failed_indexes = {failure["index"] for failure in failed}
+        inserted = [item for i, item in enumerate(items) if i not in failed_indexes]
+        self._index_add_many(inserted)
+        return {"inserted": inserted, "failed": failed}
+
+    def reembed(self, vector_fields, query=None, batch_size=500):
+        """
+        Recomputes the `vector` field of every matching item, e.g. after
+        changing the embedding model. Items are embedded and updated in batches.
+
+        Args:
+            vector_fields (list): List of text fields to combine for embedding.
+            query (dict): Optional filter for the items to re-embed.
+            batch_size (int): Number of items embedded and written per round.
+
+        Returns:
+            int: Number of re-embedded items.
+        """
+        projection = {field: 1 for field in vector_fields}
+        cursor = self.collection.find(query or {}, projection).batch_size(batch_size)
+        total = 0
+        batch = []
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                total += self._reembed_batch(batch, vector_fields)
+                batch = []
+        if batch:
+            total += self._reembed_batch(batch, vector_fields)
+
+        if total and self.vector_index is not None and self.vector_index.process_local:
+            # Rebuilt from Mongo on next use; persistent indexes were updated per batch
+            with self.vector_index.lock:
+                self.vector_index.is_built = False
+            self._bump_collection_version()
+        return total
+
+    def _reembed_batch(self, docs, vector_fields):
+        vectors = OPENAI_EMBEDDER([self._combined_text(doc, vector_fields) for doc in docs])
+        self.collection.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"vector": vector.tolist()}})
+            for doc, vector in zip(docs, vectors)
+        ], ordered=False)
+        index = self.vector_index
+        if index is not None and not index.process_local and self.index_vector_field == "vector":
+            # The point count does not change, so needs_build would keep the old vectors
+            with index.lock:
+                index.add_many((str(doc["_id"]), vector.tolist()) for doc, vector in zip(docs, vectors))
+        return len(docs)
+
+    def get_by_id(self, unique_field, value, projection=EXCLUDE_VECTOR):
+        return self.collection.find_one({unique_field: value}, projection)
+
+    def get_all(self, projection=EXCLUDE_VECTOR):
+        return list(self.collection.find({}, projection))
     
-    def get_by_query(self, query):
+    def get_by_query(self, query, projection=EXCLUDE_VECTOR):
         """
         Retrieves items from the collection based on a query.
         
         Args:
             query (dict): The query to filter items.
+            projection (dict): Fields to include/exclude. Excludes `vector` by default,
+                pass None to load full documents.
         Example:
             query = {"field_name": "value"}
         
         Returns:
             list: List of items matching the query.
         """
-        return list(self.collection.find(query))
+        return list(self.collection.find(query, projection))
     
-    def update_by_id(self, unique_field, value, update_fields):
+    def update_by_id(self, unique_field, value, update_fields, projection=EXCLUDE_VECTOR):
         """
         Updates an item in the collection by its unique field.
         
@@ -64,20 +333,39 @@ class BaseMongoHandler:
             unique_field (str): The field that uniquely identifies the item.
             value: The value of the unique field to identify the item.
             update_fields (dict): The fields to update.
+            projection (dict): Fields of the returned item. Excludes `vector` by default.
         
         Returns:
             dict: The updated item.
         """
-        result = self.collection.find_one_and_update(
+        if self.index_vector_field in update_fields:
+            # The index needs the new vector, which the caller may have projected out
+            result = self.collection.find_one_and_update(
+                {unique_field: value},
+                {'$set': update_fields},
+                projection={"_id": 1},
+                return_document=True
+            )
+            if result:
+                self._index_add({**result, self.index_vector_field: update_fields[self.index_vector_field]})
+                result = self.collection.find_one({"_id": result["_id"]}, projection)
+            return result
+        return self.collection.find_one_and_update(
             {unique_field: value},
             {'$set': update_fields},
+            projection=projection,
             return_document=True
         )
-        return result
 
     def delete_by_id(self, unique_field, value):
-        result = self.collection.delete_one({unique_field: value})
-        return result.deleted_count
+        if self.vector_index is None:
+            result = self.collection.delete_one({unique_field: value})
+            return result.deleted_count
+        deleted = self.collection.find_one_and_delete({unique_field: value}, projection={"_id": 1})
+        if not deleted:
+            return 0
+        self._index_remove([deleted["_id"]])
+        return 1
     
     def delete_by_query(self, query):
         """
@@ -89,21 +377,104 @@ class BaseMongoHandler:
         Returns:
             int: Number of deleted items.
         """
-        result = self.collection.delete_many(query)
+        if self.vector_index is None:
+            result = self.collection.delete_many(query)
+            return result.deleted_count
+        ids = [doc["_id"] for doc in self.collection.find(query, {"_id": 1})]
+        if not ids:
+            return 0
+        result = self.collection.delete_many({"_id": {"$in": ids}})
+        self._index_remove(ids)
         return result.deleted_count
 
     def delete_all(self):
         result = self.collection.delete_many({})
+        if self.vector_index is not None:
+            with self.vector_index.lock:
+                self.vector_index.clear()
+            self._bump_collection_version()
         return result.deleted_count > 0
 
-    def search(self, query, vector_field='vector', similarity_threshold=0.5):
+    def search(self, query, vector_field='vector', similarity_threshold=0.5, top_k=None):
+        """
+        Semantic search over the stored embeddings.
+
+        Args:
+            query (str): Text to embed and compare against `vector_field`.
+            vector_field (str): Field holding the item embeddings.
+            similarity_threshold (float): Only items with cosine similarity above it are returned.
+            top_k (int): Maximum number of items to return, or None for all matches.
+
+        Returns:
+            list: Matching items sorted by decreasing similarity.
+        """
         query_vector = OPENAI_EMBEDDER(query)
+        if self.vector_index is not None and vector_field == self.index_vector_field:
+            self._ensure_vector_index()
+            hits = self.vector_index.search(
+                query_vector,
+                top_k=top_k,
+                similarity_threshold=similarity_threshold
+            )
+            return self._fetch_ranked(hits)
+
         items = self.collection.find()
+        query_vector = np.asarray(query_vector, dtype=float)
+        query_norm = np.linalg.norm(query_vector)
         results = []
         for item in items:
             if vector_field in item:
-                item_vector = np.array(item[vector_field]).reshape(1, -1)
-                similarity = cosine_similarity(query_vector.reshape(1, -1), item_vector)[0][0]
+                item_vector = np.asarray(item[vector_field], dtype=float)
+                denominator = query_norm * np.linalg.norm(item_vector)
+                similarity = float(query_vector @ item_vector / denominator) if denominator else 0.0
                 results.append((item, similarity))
         results.sort(key=lambda x: x[1], reverse=True)
-        return [item for item, sim in results if sim > similarity_threshold]
\ No newline at end of file
+        matches = [item for item, sim in results if sim > similarity_threshold]
+        return matches if top_k is None else matches[:top_k]
+
+    def search_many(self, queries, top_k=None, vector_field='vector', similarity_threshold=0.5):
+        """
+        Semantic search for several queries at once.
+        All queries are embedded in a single embedding request.
+
+        Args:
+            queries (list): Texts to search for.
+            top_k (int): Maximum number of items per query, or None for all matches.
+            vector_field (str): Field holding the item embeddings.
+            similarity_threshold (float): Only items with cosine similarity above it are returned.
+
+        Returns:
+            list: One list of matching items per query, sorted by decreasing similarity.
+        """
+        if not queries:
+            return []
+        return self.search_many_by_vectors(
+            OPENAI_EMBEDDER(list(queries)),
+            top_k=top_k,
+            vector_field=vector_field,
+            similarity_threshold=similarity_threshold
+        )
+
+    def search_many_by_vectors(self, query_vectors, top_k=None, vector_field='vector', similarity_threshold=0.5):
+        """
+        Same as `search_many` but with precomputed query embeddings.
+        """
+        if len(query_vectors) == 0:
+            return []
+        if self.vector_index is not None and vector_field == self.index_vector_field:
+            self._ensure_vector_index()
+            index = self.vector_index
+        else:
+            # No index for this field: load the vectors once for all queries
+            index = MatrixVectorIndex()
+            docs = self.collection.find({vector_field: {"$exists": True}}, {vector_field: 1})
+            index.build((str(doc["_id"]), doc[vector_field]) for doc in docs)
+        hits_per_query = index.search_many(
+            query_vectors,
+            top_k=top_k,
+            similarity_threshold=similarity_threshold
+        )
+        # Load every matched document with one query
+        all_hits = {item_id: score for hits in hits_per_query for item_id, score in hits}
+        docs = {str(doc["_id"]): doc for doc in self._fetch_ranked(list(all_hits.items()))}
+        return [[docs[item_id] for item_id, _ in hits if item_id in docs] for hits in hits_per_query]
@@ -0,0 +1,72 @@
+import os
+import threading
+from pymongo import MongoClient
+from dotenv import load_dotenv
+load_dotenv()
+
+
+# Process-wide MongoClient registry, keyed by URI. A MongoClient owns a
+# connection pool and monitor threads, so all handlers share one per process.
+_CLIENTS = {}
+_LOCK = threading.Lock()
+
+
+def mongo_client_options():
+    """
+    Client options read from the environment:
+        MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+        MONGO_CONNECT_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        MONGO_SOCKET_TIMEOUT_MS, MONGO_READ_PREFERENCE
+    """
+    options = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000")),
+        "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primary"),
+        # Don't open sockets until the first operation, so clients created
+        # before a pre-fork server forks never carry live connections over.
+        "connect": False,
+    }
+    if os.getenv("MONGO_MAX_IDLE_TIME_MS"):
+        options["maxIdleTimeMS"] = int(os.getenv("MONGO_MAX_IDLE_TIME_MS"))
+    if os.getenv("MONGO_SOCKET_TIMEOUT_MS"):
+        options["socketTimeoutMS"] = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS"))
+    return options
+
+
+def get_mongo_client(uri: str = None) -> MongoClient:
+    """
+    Returns the shared MongoClient of the current process for `uri`
+    (defaults to MONGO_DB_URI), creating it on first use.
+    """
+    uri = uri or os.environ['MONGO_DB_URI']
+    client = _CLIENTS.get(uri)
+    if client is not None:
+        return client
+    with _LOCK:
+        client = _CLIENTS.get(uri)
+        if client is None:
+            client = MongoClient(uri, **mongo_client_options())
+            _CLIENTS[uri] = client
+        return client
+
+
+def close_mongo_clients():
+    """Closes every client of the current process, e.g. on shutdown."""
+    with _LOCK:
+        for client in _CLIENTS.values():
+            client.close()
+        _CLIENTS.clear()
+
+
+def _reset_after_fork():
+    # The child must not reuse the parent's pools or monitor threads; drop the
+    # references so new clients are created lazily in the child.
+    global _LOCK
+    _LOCK = threading.Lock()
+    _CLIENTS.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,70 @@
+from datetime import date, datetime, timedelta
+from typing import Tuple, Union
+
+DateLike = Union[str, date, datetime]
+
+
+def parse_timestamp(value: DateLike) -> datetime:
+    """
+    Parses an ISO-8601 timestamp or date ("2025-08-16", "2025-08-16T10:20:30.123",
+    "2023-10-01T12:00:00Z") into a naive datetime, matching how the
+    timestamps are generated with datetime.now().isoformat().
+    """
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None) if value.tzinfo else value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    return parsed.replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def timestamp_fields(value: DateLike) -> dict:
+    """
+    Typed companions of a string timestamp: `timestamp_dt` for indexed range
+    queries and a `date` bucket ("YYYY-MM-DD").
+    """
+    timestamp_dt = parse_timestamp(value)
+    return {"timestamp_dt": timestamp_dt, "date": timestamp_dt.strftime("%Y-%m-%d")}
+
+
+def _period(value: DateLike) -> Tuple[datetime, datetime]:
+    """
+    [start, end) of the period a value denotes. Strings may be a year ("2025"),
+    a month ("2025-08") or a full date/timestamp, mirroring the old
+    `^{prefix}` regex matching on ISO strings.
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        if len(value) == 4:
+            start = datetime(int(value), 1, 1)
+            return start, datetime(start.year + 1, 1, 1)
+        if len(value) == 7:
+            start = datetime(int(value[:4]), int(value[5:7]), 1)
+            end = datetime(start.year + 1, 1, 1) if start.month == 12 else datetime(start.year, start.month + 1, 1)
+            return start, end
+        if len(value) == 10:
+            start = parse_timestamp(value)
+            return start, start + timedelta(days=1)
+        start = parse_timestamp(value)
+        return start, start + timedelta(microseconds=1)
+    if isinstance(value, datetime):
+        start = parse_timestamp(value)
+        return start, start + timedelta(microseconds=1)
+    start = parse_timestamp(value)
+    return start, start + timedelta(days=1)
+
+
+def date_range(start: DateLike, end: DateLike = None) -> Tuple[datetime, datetime]:
+    """
+    Half-open [from, to) datetime range covering the `start` period through
+    the `end` period (inclusive). With no `end` only the `start` period is covered.
+    """
+    range_start, range_end = _period(start)
+    if end is not None:
+        range_end = _period(end)[1]
+    return range_start, range_end
+
+
+def date_range_query(start: DateLike, end: DateLike = None, field: str = "timestamp_dt") -> dict:
+    range_start, range_end = date_range(start, end)
+    return {field: {"$gte": range_start, "$lt": range_end}}
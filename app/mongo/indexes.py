@@ -0,0 +1,90 @@
+"""
+Index bootstrap and COLLSCAN reporting for the collections used by the handlers.
+
+Usage:
+    python -m app.mongo.indexes ensure
+    python -m app.mongo.indexes report
+"""
+import os
+import sys
+import json
+from dotenv import load_dotenv
+from app.mongo.agri_handlers import ALL_HANDLERS
+load_dotenv()
+
+
+def ensure_all_indexes():
+    """
+    Applies the declared indexes of every handler. Idempotent.
+
+    Returns:
+        list: One report per collection with created indexes and errors.
+    """
+    return [handler.ensure_indexes() for handler in ALL_HANDLERS.values()]
+
+
+def profiler_collscans(limit=50):
+    """
+    Lists recent COLLSCAN operations recorded by the database profiler.
+    Empty unless profiling is enabled (db.setProfilingLevel(1)).
+    """
+    handler = next(iter(ALL_HANDLERS.values()))
+    if "system.profile" not in handler.db.list_collection_names():
+        return []
+    entries = handler.db["system.profile"].find(
+        {"planSummary": "COLLSCAN"},
+        {"ns": 1, "op": 1, "command.filter": 1, "millis": 1, "docsExamined": 1, "ts": 1}
+    ).sort("ts", -1).limit(limit)
+    return [
+        {
+            "ns": entry.get("ns"),
+            "op": entry.get("op"),
+            "filter": entry.get("command", {}).get("filter"),
+            "millis": entry.get("millis"),
+            "docs_examined": entry.get("docsExamined"),
+        }
+        for entry in entries
+    ]
+
+
+def collscan_report(include_profiler=True):
+    """
+    Reports the declared hot queries that still scan their whole collection,
+    plus COLLSCAN operations seen by the profiler.
+    """
+    report = {
+        "declared_queries": [
+            collscan
+            for handler in ALL_HANDLERS.values()
+            for collscan in handler.collscan_report()
+        ]
+    }
+    if include_profiler:
+        report["profiler"] = profiler_collscans()
+    return report
+
+
+def ensure_indexes_on_startup():
+    """
+    Applies indexes when the app starts unless MONGO_ENSURE_INDEXES=false.
+    Failures are logged rather than raised so the app still starts.
+    """
+    if os.getenv("MONGO_ENSURE_INDEXES", "true").lower() != "true":
+        return
+    try:
+        for report in ensure_all_indexes():
+            for name, error in report["errors"].items():
+                print(f"Could not create index {name} on {report['collection']}: {error}")
+    except Exception as e:
+        print(f"Error ensuring Mongo indexes: {e}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "ensure"
+    if command == "ensure":
+        print(json.dumps(ensure_all_indexes(), indent=2, default=str))
+    elif command == "report":
+        print(json.dumps(collscan_report(), indent=2, default=str))
+    else:
+        print(__doc__)
+        sys.exit(1)
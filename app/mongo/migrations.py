@@ -0,0 +1,59 @@
+"""
+Data migrations for the Mongo collections.
+
+Usage:
+    python -m app.mongo.migrations timestamps
+"""
+import sys
+import json
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+from app.mongo.agri_handlers import ALERT_STORAGE_HANDLER, AGRI_PRODUCT_SERVICE_SUGGESTION_HANDLER
+from app.mongo.dates import timestamp_fields
+load_dotenv()
+
+
+def migrate_timestamps(handler, batch_size=1000):
+    """
+    Backfills `timestamp_dt` and `date` from the ISO `timestamp` string of
+    documents written before those fields existed. Safe to re-run.
+
+    Returns:
+        dict: Number of migrated documents and unparseable timestamps.
+    """
+    cursor = handler.collection.find(
+        {"timestamp_dt": {"$exists": False}, "timestamp": {"$type": "string", "$ne": ""}},
+        {"timestamp": 1}
+    ).batch_size(batch_size)
+    migrated = 0
+    skipped = []
+    updates = []
+    for doc in cursor:
+        try:
+            fields = timestamp_fields(doc["timestamp"])
+        except ValueError:
+            skipped.append(doc["timestamp"])
+            continue
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+        if len(updates) == batch_size:
+            migrated += handler.collection.bulk_write(updates, ordered=False).modified_count
+            updates = []
+    if updates:
+        migrated += handler.collection.bulk_write(updates, ordered=False).modified_count
+    return {"collection": handler.collection_name, "migrated": migrated, "unparseable": skipped}
+
+
+def migrate_all_timestamps():
+    return [
+        migrate_timestamps(ALERT_STORAGE_HANDLER),
+        migrate_timestamps(AGRI_PRODUCT_SERVICE_SUGGESTION_HANDLER),
+    ]
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "timestamps":
+        print(json.dumps(migrate_all_timestamps(), indent=2, default=str))
+    else:
+        print(__doc__)
+        sys.exit(1)
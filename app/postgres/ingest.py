@@ -0,0 +1,240 @@
+import os
+import io
+import csv
+import json
+import atexit
+import threading
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+from app.postgres.rds import RDS_POSTGRES_DB
+from app.postgres.rollups import refresh_rollups_for_rows
+load_dotenv()
+
+
+def parse_timestamp(value) -> str:
+    """
+    Validates an ISO 8601 timestamp ("Z" allowed). The value is kept as sent
+    so row hashes match rows ingested before validation existed.
+    """
+    value = str(value).strip()
+    try:
+        datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return value
+    except ValueError:
+        raise ValueError(f"Invalid timestamp '{value}', expected ISO 8601 (e.g. 2025-08-16T10:00:00Z)")
+
+
+def parse_metric(value) -> float:
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"Metric values must be finite, got {value}")
+    return value
+
+
+# Columns accepted from sensor hubs and the parser converting them to the stored type.
+# Values are coerced so rows hash identically whichever payload format they came in.
+SENSOR_COLUMNS = {
+    "timestamp": parse_timestamp,
+    "sensor_hub_id": str,
+    "nitrogen_level": parse_metric,
+    "phosphorus_level": parse_metric,
+    "potassium_level": parse_metric,
+    "temperature": parse_metric,
+    "humidity": parse_metric,
+    "ph_level": parse_metric,
+}
+REQUIRED_SENSOR_COLUMNS = ("timestamp", "sensor_hub_id")
+
+
+def coerce_sensor_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validates one sensor reading and converts its values to the column types.
+    Missing columns and empty strings become None.
+    Raises ValueError for unknown columns, missing required columns or bad values.
+    """
+    unknown = set(row) - set(SENSOR_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    missing = [col for col in REQUIRED_SENSOR_COLUMNS if row.get(col) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    # Every column is present so a missing key, an empty CSV cell and null all hash the same
+    coerced = {}
+    for col in SENSOR_COLUMNS:
+        value = row.get(col)
+        if value is None or value == "":
+            coerced[col] = None
+            continue
+        try:
+            coerced[col] = SENSOR_COLUMNS[col](value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Bad value for {col}: {e}")
+    return coerced
+
+
+def parse_sensor_payload(body: str, fmt: str) -> List[Dict[str, Any]]:
+    """
+    Parses a batch of sensor readings sent as NDJSON (one JSON object per
+    line) or CSV with a header row.
+    """
+    if fmt == "csv":
+        records = list(csv.DictReader(io.StringIO(body)))
+    elif fmt == "ndjson":
+        records = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        raise ValueError(f"Unsupported format '{fmt}'. Use 'ndjson' or 'csv'.")
+    rows = []
+    for line_no, record in enumerate(records, start=1):
+        try:
+            rows.append(coerce_sensor_row(record))
+        except ValueError as e:
+            raise ValueError(f"Record {line_no}: {e}")
+    return rows
+
+
+class SensorIngestBufferFull(Exception):
+    """Raised when the buffer holds SENSOR_INGEST_MAX_PENDING rows, e.g. while the database is down."""
+
+
+def _is_permanent_error(e: Exception) -> bool:
+    # Bad data is rejected the same way on every retry; connection problems are not
+    try:
+        from psycopg2 import DataError, IntegrityError, ProgrammingError
+    except ImportError:
+        return False
+    return isinstance(e, (DataError, IntegrityError, ProgrammingError))
+
+
+class SensorIngestBuffer:
+    """
+    Buffers sensor rows and writes them with `RDSPostgresDB.insert_many` once
+    `batch_size` rows are queued or every `flush_interval` seconds. After each
+    write the rollup buckets touched by the batch are refreshed, unless
+    SENSOR_ROLLUPS_ON_INGEST=false (then rely on the scheduled refresh).
+
+    Buffered rows only live in memory until flushed. At most `max_pending`
+    rows (SENSOR_INGEST_MAX_PENDING, default 50000) are held; beyond that
+    `add` raises SensorIngestBufferFull. A batch failing on a connection
+    error is re-queued; rows failing on bad data are written one by one and
+    the rejected ones appended to the dead-letter file
+    (SENSOR_INGEST_DEAD_LETTER_PATH) instead of blocking every later flush.
+    """
+
+    def __init__(self, db=RDS_POSTGRES_DB, table_name: str = "arduino_data", batch_size: int = None,
+                 flush_interval: float = None, max_pending: int = None, dead_letter_path: str = None):
+        self.db = db
+        self.table_name = table_name
+        self.batch_size = batch_size or int(os.getenv("SENSOR_INGEST_BATCH_SIZE", "500"))
+        self.flush_interval = flush_interval or float(os.getenv("SENSOR_INGEST_FLUSH_SECONDS", "5"))
+        self.max_pending = max_pending or int(os.getenv("SENSOR_INGEST_MAX_PENDING", "50000"))
+        self.dead_letter_path = dead_letter_path or os.getenv(
+            "SENSOR_INGEST_DEAD_LETTER_PATH", "./tmp/sensor_dead_letter.ndjson"
+        )
+        self.rows = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self._flusher_pid = None
+        self.inserted = 0
+        self.dead_lettered = 0
+        self.refresh_rollups = os.getenv("SENSOR_ROLLUPS_ON_INGEST", "true").lower() == "true"
+
+    def _ensure_flusher(self):
+        # Started lazily so pre-fork servers get one flusher per worker
+        if self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing sensor rows: {e}")
+
+    def add(self, rows: List[Dict[str, Any]]):
+        with self.lock:
+            if len(self.rows) + len(rows) > self.max_pending:
+                raise SensorIngestBufferFull(
+                    f"Sensor ingest buffer is full ({len(self.rows)} rows pending), retry later"
+                )
+            self._ensure_flusher()
+            self.rows.extend(rows)
+            should_flush = len(self.rows) >= self.batch_size
+        if should_flush:
+            self.flush()
+
+    def _dead_letter(self, rows: List[Dict[str, Any]], error: Exception):
+        self.dead_lettered += len(rows)
+        print(f"Dead-lettering {len(rows)} sensor rows: {error}")
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+            with open(self.dead_letter_path, "a") as f:
+                for row in rows:
+                    f.write(json.dumps({"row": row, "error": str(error)}, default=str) + "\n")
+        except OSError as e:
+            print(f"Could not write sensor dead letters: {e}")
+
+    def write(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Writes rows now, bypassing the buffer. Rows rejected for bad data are
+        isolated and dead-lettered; connection errors are raised.
+
+        Returns:
+            int: Number of rows actually inserted.
+        """
+        try:
+            inserted = self.db.insert_many(self.table_name, rows)
+        except Exception as e:
+            if not _is_permanent_error(e):
+                raise
+            # Find the offending rows so the rest of the batch still lands
+            inserted = 0
+            for row in rows:
+                try:
+                    inserted += self.db.insert_many(self.table_name, [row])
+                except Exception as row_error:
+                    if not _is_permanent_error(row_error):
+                        raise
+                    self._dead_letter([row], row_error)
+        self.inserted += inserted
+        if inserted and self.refresh_rollups:
+            # The rows are stored; a failed refresh is repaired by the next scheduled one
+            try:
+                refresh_rollups_for_rows(self.db, rows)
+            except Exception as e:
+                print(f"Error refreshing sensor rollups: {e}")
+        return inserted
+
+    def flush(self) -> int:
+        """Writes every queued row. Rows are re-queued if the database is unreachable."""
+        with self.flush_lock:
+            with self.lock:
+                rows, self.rows = self.rows, []
+            if not rows:
+                return 0
+            try:
+                return self.write(rows)
+            except Exception:
+                with self.lock:
+                    self.rows = rows + self.rows
+                raise
+
+    def pending(self) -> int:
+        with self.lock:
+            return len(self.rows)
+
+
+SENSOR_INGEST_BUFFER = SensorIngestBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        SENSOR_INGEST_BUFFER.flush()
+    except Exception as e:
+        print(f"Error flushing sensor rows on exit: {e}")
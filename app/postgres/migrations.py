@@ -0,0 +1,96 @@
+"""
+Schema migrations for the Postgres sensor tables.
+
+Usage:
+    python -m app.postgres.migrations arduino_data [--drop-legacy]
+"""
+import sys
+import json
+from dotenv import load_dotenv
+from sqlalchemy import text
+from app.postgres.schema import (
+    ARDUINO_DATA_TABLE, table_kind, create_arduino_data, create_month_partition, ensure_sensor_schema
+)
+from app.postgres.rollups import backfill_rollups
+load_dotenv()
+
+
+LEGACY_ARDUINO_DATA_TABLE = f"{ARDUINO_DATA_TABLE}_legacy"
+
+# Only rows whose string timestamp looks like an ISO date are cast; others are reported
+ISO_TIMESTAMP_PATTERN = r"^\d{4}-\d{2}-\d{2}"
+
+
+def migrate_arduino_data(db, drop_legacy=False):
+    """
+    Moves a plain `arduino_data` table (string timestamps, hash PK only) to the
+    partitioned, typed schema from app.postgres.schema in one transaction:
+    the old table is renamed to `arduino_data_legacy`, the new table and the
+    partitions for every month present in the data are created, and rows are
+    copied with `timestamp::timestamptz`. Naive timestamps are read in the
+    session time zone (UTC on RDS by default). The rollups are backfilled
+    afterwards. Safe to re-run.
+
+    Returns:
+        dict: Copied and skipped row counts.
+    """
+    with db.engine.begin() as conn:
+        kind = table_kind(conn, ARDUINO_DATA_TABLE)
+        legacy_kind = table_kind(conn, LEGACY_ARDUINO_DATA_TABLE)
+        if kind == "p" and legacy_kind is None:
+            return {"status": "already migrated", "copied": 0, "skipped": 0}
+
+        if kind == "r":
+            conn.execute(text(f"ALTER TABLE {ARDUINO_DATA_TABLE} RENAME TO {LEGACY_ARDUINO_DATA_TABLE}"))
+            # Free the old constraint name for the new table's primary key
+            conn.execute(text(
+                f"ALTER TABLE {LEGACY_ARDUINO_DATA_TABLE} "
+                f"RENAME CONSTRAINT {ARDUINO_DATA_TABLE}_pkey TO {LEGACY_ARDUINO_DATA_TABLE}_pkey"
+            ))
+        create_arduino_data(conn)
+
+        valid_rows = f"FROM {LEGACY_ARDUINO_DATA_TABLE} WHERE timestamp ~ :pattern"
+        months = conn.execute(
+            text(f"SELECT DISTINCT date_trunc('month', timestamp::timestamptz) {valid_rows}"),
+            {"pattern": ISO_TIMESTAMP_PATTERN}
+        ).scalars().all()
+        for month in months:
+            create_month_partition(conn, month)
+
+        copied = conn.execute(
+            text(f"""
+                INSERT INTO {ARDUINO_DATA_TABLE} (
+                    id, timestamp, sensor_hub_id, nitrogen_level, phosphorus_level,
+                    potassium_level, temperature, humidity, ph_level
+                )
+                SELECT
+                    id, timestamp::timestamptz, sensor_hub_id, nitrogen_level, phosphorus_level,
+                    potassium_level, temperature, humidity, ph_level
+                {valid_rows} AND sensor_hub_id IS NOT NULL
+                ON CONFLICT DO NOTHING
+            """),
+            {"pattern": ISO_TIMESTAMP_PATTERN}
+        ).rowcount
+        total = conn.execute(text(f"SELECT count(*) FROM {LEGACY_ARDUINO_DATA_TABLE}")).scalar()
+
+        if drop_legacy:
+            conn.execute(text(f"DROP TABLE {LEGACY_ARDUINO_DATA_TABLE}"))
+
+    ensure_sensor_schema(db)
+    with db.engine.begin() as conn:
+        conn.execute(text(f"ANALYZE {ARDUINO_DATA_TABLE}"))
+    rollups = backfill_rollups(db)
+    return {
+        "status": "migrated", "copied": copied, "skipped": total - copied,
+        "legacy_dropped": drop_legacy, "rollup_buckets": rollups,
+    }
+
+
+if __name__ == "__main__":
+    from app.postgres.rds import RDS_POSTGRES_DB
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "arduino_data":
+        print(json.dumps(migrate_arduino_data(RDS_POSTGRES_DB, drop_legacy="--drop-legacy" in sys.argv), indent=2))
+    else:
+        print(__doc__)
+        sys.exit(1)
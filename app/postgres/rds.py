@@ -1,9 +1,14 @@
 
 import os
+import io
+import csv
 import hashlib
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, MetaData, Table, Column, String, text, Integer, Float, DateTime
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker
+from app.utils.lazy import lazy_service
 load_dotenv()
 
 class RDSPostgresDB:
@@ -18,20 +23,50 @@ class RDSPostgresDB:
         # PostgreSQL connection string
         conn_str = f"postgresql+psycopg2://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
 
-        self.engine = create_engine(conn_str, echo=False)
+        # Every query/insert borrows a pooled connection for its own unit of
+        # work, so concurrent requests never share a session or transaction.
+        self.engine = create_engine(
+            conn_str,
+            echo=False,
+            pool_size=int(os.getenv("AWS_DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("AWS_DB_MAX_OVERFLOW", "10")),
+            pool_timeout=int(os.getenv("AWS_DB_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("AWS_DB_POOL_RECYCLE", "1800")),
+            pool_pre_ping=os.getenv("AWS_DB_POOL_PRE_PING", "true").lower() == "true",
+        )
         self.metadata = MetaData()
         self.Session = sessionmaker(bind=self.engine)
-        self.session = self.Session()
-        self.create_database()
+        if hasattr(os, "register_at_fork"):
+            # Forked workers must open their own connections instead of reusing the parent's
+            os.register_at_fork(after_in_child=lambda: self.engine.dispose(close=False))
+        # No connection is opened here; the readiness endpoint probes the database
+
+    @contextmanager
+    def session_scope(self):
+        """Provides a session for one unit of work: committed on success, rolled back on error."""
+        session = self.Session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
 
     def create_database(self):
         """Creates the database if it does not exist."""
         try:
-            self.engine.connect()
-            print("Database connection established.")
+            with self.engine.connect():
+                print("Database connection established.")
         except Exception as e:
             print(f"Error connecting to the database: {e}")
 
+    def ping(self):
+        """Round trip to the database. Raises if it is unreachable."""
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
     def create_table(self, table_name, columns_with_types):
         """Creates a table dynamically with a SHA-256 hash primary key to prevent duplicates."""
         table = Table(
@@ -65,57 +100,102 @@ class RDSPostgresDB:
         query = text(f"""
             INSERT INTO {table_name} ({', '.join(data.keys())})
             VALUES ({placeholders})
-            ON CONFLICT(id) DO NOTHING
+            ON CONFLICT DO NOTHING
         """)
-        self.session.execute(query, data)
-        self.session.commit()
+        with self.engine.begin() as conn:
+            conn.execute(query, data)
+
+    def insert_many(self, table_name, rows, batch_size=None):
+        """
+        Bulk-inserts rows and skips duplicates. Rows get the same hash id as
+        `insert_data` and are deduplicated within the call. Each batch is
+        streamed with COPY FROM STDIN into a temporary staging table and then
+        moved with one INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+
+        Returns:
+            int: Number of rows actually inserted.
+        """
+        batch_size = batch_size or int(os.getenv("AWS_DB_COPY_BATCH_SIZE", "5000"))
+        unique_rows = {}
+        for row in rows:
+            row = dict(row)
+            row["id"] = self.generate_hash(row)
+            unique_rows.setdefault(row["id"], row)
+        rows = list(unique_rows.values())
+        if not rows:
+            return 0
+
+        columns = ["id"] + sorted({key for row in rows for key in row if key != "id"})
+        column_list = ", ".join(columns)
+        staging_table = f"{table_name}_staging"
+        inserted = 0
+        raw_conn = self.engine.raw_connection()
+        try:
+            cursor = raw_conn.cursor()
+            # Session-local staging table, emptied by every commit
+            cursor.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS {staging_table} "
+                f"(LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+            for start in range(0, len(rows), batch_size):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in rows[start:start + batch_size]:
+                    # An unquoted empty CSV field is loaded as NULL
+                    writer.writerow(["" if row.get(col) is None else row.get(col) for col in columns])
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {staging_table} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+                cursor.execute(
+                    f"INSERT INTO {table_name} ({column_list}) "
+                    f"SELECT {column_list} FROM {staging_table} ON CONFLICT DO NOTHING"
+                )
+                inserted += cursor.rowcount
+                raw_conn.commit()
+            cursor.close()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+        return inserted
+
+    def stream_query(self, query, params=None, batch_size=None):
+        """
+        Executes a SELECT query through a server-side cursor and yields the
+        column names first, then one row at a time. Only `batch_size` rows
+        (AWS_DB_STREAM_BATCH_SIZE, default 1000) are held in memory at once.
+        The connection is returned to the pool when the generator is exhausted or closed.
+        """
+        batch_size = batch_size or int(os.getenv("AWS_DB_STREAM_BATCH_SIZE", "1000"))
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(text(query), params or {})
+            yield list(result.keys())
+            for row in result:
+                yield list(row)
 
-    def query_data(self, query, max_retries=2):
-        """Executes a SELECT query and returns results with column names."""
+    def query_data(self, query, params=None, max_retries=2):
+        """
+        Executes a SELECT query on a pooled connection and returns results with column names.
+        Retries only when the connection itself was lost; SQL errors are raised immediately.
+        """
         for attempt in range(max_retries):
             try:
-                result = self.session.execute(text(query))
-                columns = result.keys()
-                data = [list(row) for row in result.fetchall()]
-                return list(columns), data
-            except Exception as e:
+                with self.engine.connect() as conn:
+                    result = conn.execute(text(query), params or {})
+                    columns = result.keys()
+                    data = [list(row) for row in result.fetchall()]
+                    return list(columns), data
+            except DBAPIError as e:
                 print(f"Query attempt {attempt + 1} failed: {e}")
-                
-                # Check if it's a transaction error
-                if "InFailedSqlTransaction" in str(e) or "aborted" in str(e).lower():
-                    print("Transaction error detected. Rolling back and reconnecting...")
-                    self.rollback_transaction()
-                    self.close_and_reconnect()
-                
-                # If this is the last attempt, raise the exception
-                if attempt == max_retries - 1:
-                    print(f"All {max_retries} attempts failed.")
+
+                # The pool has already discarded the broken connection
+                if not e.connection_invalidated or attempt == max_retries - 1:
                     raise e
-                
-                print(f"Retrying in attempt {attempt + 2}...")
-        
-        # This should never be reached, but just in case
-        raise Exception("Unexpected error in query_data retry logic")
-    
-    def rollback_transaction(self):
-        """Rolls back the current transaction."""
-        try:
-            self.session.rollback()
-            print("Transaction rolled back successfully.")
-        except Exception as e:
-            print(f"Error rolling back transaction: {e}")
 
-    def close_and_reconnect(self):
-        """Closes the current session and reconnects to the database."""
-        try:
-            self.session.close()
-            self.session = self.Session()
-            print("Reconnected to the database successfully.")
-        except Exception as e:
-            print(f"Error reconnecting to the database: {e}")
+                print(f"Connection lost. Retrying in attempt {attempt + 2}...")
 
-    def __del__(self):
-        self.session.close()
+        # This should never be reached, but just in case
+        raise Exception("Unexpected error in query_data retry logic")
 
 
-RDS_POSTGRES_DB = RDSPostgresDB()
\ No newline at end of file
+RDS_POSTGRES_DB = lazy_service("postgres", RDSPostgresDB)
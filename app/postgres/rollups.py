@@ -0,0 +1,170 @@
+"""
+Maintenance of the hourly/daily sensor rollup tables.
+
+Buckets are recomputed from raw `arduino_data` rows (not incremented), so a
+refresh is idempotent and duplicate raw rows skipped by ON CONFLICT can never
+be double counted. Ingestion refreshes only the days it touched; the CLI
+refreshes a recent window from a scheduled job (cron) or backfills everything.
+
+Usage:
+    python -m app.postgres.rollups refresh [hours]   # default: last 48 hours
+    python -m app.postgres.rollups backfill
+"""
+import sys
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List
+from dotenv import load_dotenv
+from sqlalchemy import text
+from app.postgres.schema import (
+    ARDUINO_DATA_TABLE, ROLLUP_GRANULARITIES, SENSOR_METRICS, rollup_table_name, stats_view_name, stats_view_columns
+)
+load_dotenv()
+
+
+def _refresh_sql(granularity: str, hub_filter: bool) -> str:
+    unit = ROLLUP_GRANULARITIES[granularity]
+    aggregates, updates = [], ["sample_count = EXCLUDED.sample_count"]
+    for metric in SENSOR_METRICS:
+        aggregates += [
+            f"count({metric})", f"sum({metric})", f"sum({metric} * {metric})", f"min({metric})", f"max({metric})"
+        ]
+        for suffix in ("count", "sum", "sumsq", "min", "max"):
+            updates.append(f"{metric}_{suffix} = EXCLUDED.{metric}_{suffix}")
+    # Whole days are refreshed so hourly and daily buckets share one window
+    where = [
+        "timestamp >= date_trunc('day', CAST(:start AS timestamptz))",
+        "timestamp < date_trunc('day', CAST(:end AS timestamptz)) + interval '1 day'",
+    ]
+    if hub_filter:
+        where.append("sensor_hub_id = ANY(:sensor_hub_ids)")
+    columns = ["sensor_hub_id", "bucket", "sample_count"] + [
+        f"{metric}_{suffix}" for metric in SENSOR_METRICS for suffix in ("count", "sum", "sumsq", "min", "max")
+    ]
+    return f"""
+        INSERT INTO {rollup_table_name(granularity)} ({', '.join(columns)})
+        SELECT sensor_hub_id, date_trunc('{unit}', timestamp) AS bucket, count(*), {', '.join(aggregates)}
+        FROM {ARDUINO_DATA_TABLE}
+        WHERE {' AND '.join(where)}
+        GROUP BY sensor_hub_id, bucket
+        ON CONFLICT (sensor_hub_id, bucket) DO UPDATE SET {', '.join(updates)}
+    """
+
+
+def _lock_rollups(conn, sensor_hub_ids: List[str] = None):
+    """
+    Serializes concurrent refreshes of the same hub (two ingest workers, or
+    ingest and the scheduled job) until the transaction ends, so an older
+    snapshot can't overwrite a newer bucket. A refresh of every hub takes the
+    global lock exclusively; per-hub refreshes share it and lock their hubs
+    in sorted order to avoid deadlocks.
+    """
+    if sensor_hub_ids is None:
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('sensor_rollups'))"))
+        return
+    conn.execute(text("SELECT pg_advisory_xact_lock_shared(hashtext('sensor_rollups'))"))
+    for hub_id in sorted(set(sensor_hub_ids)):
+        conn.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext('sensor_rollups'), hashtext(:hub_id))"),
+            {"hub_id": hub_id}
+        )
+
+
+def refresh_rollups(db, start: datetime, end: datetime, sensor_hub_ids: List[str] = None) -> Dict[str, int]:
+    """
+    Recomputes every rollup bucket in the UTC days from `start` through `end`,
+    optionally only for `sensor_hub_ids`. Naive datetimes are taken as UTC.
+
+    Returns:
+        dict: Buckets written per granularity.
+    """
+    params = {"start": _parse_timestamp(start), "end": _parse_timestamp(end)}
+    if sensor_hub_ids is not None:
+        params["sensor_hub_ids"] = list(sensor_hub_ids)
+    written = {}
+    with db.engine.begin() as conn:
+        # Day windows and buckets must not depend on the server's TimeZone setting
+        conn.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+        _lock_rollups(conn, sensor_hub_ids)
+        for granularity in ROLLUP_GRANULARITIES:
+            result = conn.execute(text(_refresh_sql(granularity, sensor_hub_ids is not None)), params)
+            written[granularity] = result.rowcount
+    return written
+
+
+def _parse_timestamp(value) -> datetime:
+    """Aware UTC datetime; readings without an offset are taken as UTC."""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def refresh_rollups_for_rows(db, rows: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Refreshes the buckets touched by freshly ingested rows: one refresh per
+    hub covering the days between its oldest and newest reading.
+    """
+    windows = {}
+    for row in rows:
+        try:
+            timestamp = _parse_timestamp(row["timestamp"])
+        except (KeyError, ValueError):
+            continue
+        hub_id = row.get("sensor_hub_id")
+        start, end = windows.get(hub_id, (timestamp, timestamp))
+        windows[hub_id] = (min(start, timestamp), max(end, timestamp))
+
+    written = {granularity: 0 for granularity in ROLLUP_GRANULARITIES}
+    for hub_id, (start, end) in windows.items():
+        for granularity, count in refresh_rollups(db, start, end, [hub_id]).items():
+            written[granularity] += count
+    return written
+
+
+def refresh_recent_rollups(db, hours: int = 48) -> Dict[str, int]:
+    """Recomputes the rollups of every hub over the last `hours` hours."""
+    end = datetime.now(timezone.utc)
+    return refresh_rollups(db, end - timedelta(hours=hours), end)
+
+
+def backfill_rollups(db) -> Dict[str, int]:
+    """Recomputes the rollups over the whole raw history."""
+    with db.engine.connect() as conn:
+        start, end = conn.execute(text(f"SELECT min(timestamp), max(timestamp) FROM {ARDUINO_DATA_TABLE}")).one()
+    if start is None:
+        return {granularity: 0 for granularity in ROLLUP_GRANULARITIES}
+    return refresh_rollups(db, start, end)
+
+
+def query_rollup_stats(db, sensor_hub_id: str, granularity: str, limit: int = None):
+    """
+    Reads the derived stats (avg, stddev, min, max per metric) of one hub,
+    newest bucket first.
+
+    Returns:
+        tuple: (columns, rows) like RDSPostgresDB.query_data.
+    """
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}'. Use one of: {', '.join(ROLLUP_GRANULARITIES)}")
+    query = (
+        f"SELECT {', '.join(stats_view_columns())} FROM {stats_view_name(granularity)} "
+        f"WHERE sensor_hub_id = :sensor_hub_id ORDER BY bucket DESC"
+    )
+    params = {"sensor_hub_id": sensor_hub_id}
+    if limit:
+        query += " LIMIT :limit"
+        params["limit"] = limit
+    return db.query_data(query, params)
+
+
+if __name__ == "__main__":
+    from app.postgres.rds import RDS_POSTGRES_DB
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "refresh":
+        hours = int(sys.argv[2]) if len(sys.argv) > 2 else 48
+        print(json.dumps(refresh_recent_rollups(RDS_POSTGRES_DB, hours), indent=2))
+    elif command == "backfill":
+        print(json.dumps(backfill_rollups(RDS_POSTGRES_DB), indent=2))
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,218 @@
+"""
+DDL for the sensor tables and their hourly/daily rollups.
+
+`arduino_data` is range-partitioned by month on a typed `timestamp`
+(timestamptz) column. It is indexed on (sensor_hub_id, timestamp DESC) because
+every sensor query filters by hub and usually by a time window, so the planner
+prunes to the relevant month partitions and scans only the hub's rows.
+
+Usage:
+    python -m app.postgres.schema ensure
+"""
+import os
+import sys
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from sqlalchemy import MetaData, Table, Column, String, Float, DateTime, BigInteger, text
+load_dotenv()
+
+
+ARDUINO_DATA_TABLE = "arduino_data"
+ARDUINO_DATA_HUB_TIME_INDEX = "arduino_data_hub_timestamp_idx"
+
+SCHEMA_METADATA = MetaData()
+
+# The partition key must be part of the primary key, hence (id, timestamp).
+# `id` stays the row hash generated by RDSPostgresDB.generate_hash.
+ARDUINO_DATA = Table(
+    ARDUINO_DATA_TABLE, SCHEMA_METADATA,
+    Column("id", String, primary_key=True),
+    Column("timestamp", DateTime(timezone=True), primary_key=True),
+    Column("sensor_hub_id", String, nullable=False),
+    Column("nitrogen_level", Float),
+    Column("phosphorus_level", Float),
+    Column("potassium_level", Float),
+    Column("temperature", Float),
+    Column("humidity", Float),
+    Column("ph_level", Float),
+    postgresql_partition_by="RANGE (timestamp)",
+)
+
+SENSOR_METRICS = (
+    "nitrogen_level", "phosphorus_level", "potassium_level", "temperature", "humidity", "ph_level"
+)
+
+# Rollup name -> date_trunc unit. Each rollup table keeps additive
+# aggregates (count, sum, sum of squares, min, max) per hub and bucket; the
+# matching stats view derives avg and stddev from them.
+ROLLUP_GRANULARITIES = {"hourly": "hour", "daily": "day"}
+
+
+def rollup_table_name(granularity: str) -> str:
+    return f"sensor_rollup_{granularity}"
+
+
+def stats_view_name(granularity: str) -> str:
+    return f"sensor_stats_{granularity}"
+
+
+def _rollup_table(granularity: str) -> Table:
+    metric_columns = []
+    for metric in SENSOR_METRICS:
+        metric_columns += [
+            Column(f"{metric}_count", BigInteger, nullable=False),
+            Column(f"{metric}_sum", Float),
+            Column(f"{metric}_sumsq", Float),
+            Column(f"{metric}_min", Float),
+            Column(f"{metric}_max", Float),
+        ]
+    return Table(
+        rollup_table_name(granularity), SCHEMA_METADATA,
+        Column("sensor_hub_id", String, primary_key=True),
+        Column("bucket", DateTime(timezone=True), primary_key=True),
+        Column("sample_count", BigInteger, nullable=False),
+        *metric_columns,
+    )
+
+
+ROLLUP_TABLES = {granularity: _rollup_table(granularity) for granularity in ROLLUP_GRANULARITIES}
+
+
+def stats_view_columns():
+    """Columns of the sensor_stats_* views, in order."""
+    columns = ["sensor_hub_id", "bucket", "sample_count"]
+    for metric in SENSOR_METRICS:
+        columns += [f"{metric}_avg", f"{metric}_stddev", f"{metric}_min", f"{metric}_max"]
+    # Non-null samples per metric, the weight of {metric}_avg. Kept last so
+    # CREATE OR REPLACE VIEW can add them to existing views.
+    columns += [f"{metric}_count" for metric in SENSOR_METRICS]
+    return columns
+
+
+def _stats_view_sql(granularity: str) -> str:
+    selects = ["sensor_hub_id", "bucket", "sample_count"]
+    for metric in SENSOR_METRICS:
+        n, total, sumsq = f"{metric}_count", f"{metric}_sum", f"{metric}_sumsq"
+        selects += [
+            f"{total} / NULLIF({n}, 0) AS {metric}_avg",
+            # Sample standard deviation from the additive aggregates
+            f"CASE WHEN {n} > 1 THEN sqrt(GREATEST(({sumsq} - {total} * {total} / {n}) / ({n} - 1), 0)) END "
+            f"AS {metric}_stddev",
+            f"{metric}_min",
+            f"{metric}_max",
+        ]
+    selects += [f"{metric}_count" for metric in SENSOR_METRICS]
+    return (
+        f"CREATE OR REPLACE VIEW {stats_view_name(granularity)} AS "
+        f"SELECT {', '.join(selects)} FROM {rollup_table_name(granularity)}"
+    )
+
+
+def _add_months(month_start: datetime, months: int) -> datetime:
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return month_start.replace(year=index // 12, month=index % 12 + 1)
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month: datetime, table_name: str = ARDUINO_DATA_TABLE) -> str:
+    return f"{table_name}_y{month.year:04d}m{month.month:02d}"
+
+
+def create_month_partition(conn, month: datetime, table_name: str = ARDUINO_DATA_TABLE):
+    """Creates the partition holding [month, next month) if it is missing."""
+    start = month_start(month)
+    end = _add_months(start, 1)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start, table_name)} PARTITION OF {table_name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+
+def ensure_partitions(db, months_back: int = None, months_ahead: int = None, around: datetime = None):
+    """
+    Creates monthly partitions from `months_back` months before to
+    `months_ahead` months after `around` (default: now). Rows outside every
+    monthly partition land in the DEFAULT partition, so ingestion never fails
+    on a missing month.
+
+    Returns:
+        dict: Partition names created or already present, and per-partition errors.
+    """
+    months_back = int(os.getenv("SENSOR_PARTITION_MONTHS_BACK", "1")) if months_back is None else months_back
+    months_ahead = int(os.getenv("SENSOR_PARTITION_MONTHS_AHEAD", "3")) if months_ahead is None else months_ahead
+    current = month_start(around or datetime.now(timezone.utc))
+    report = {"partitions": [], "errors": {}}
+    for offset in range(-months_back, months_ahead + 1):
+        month = _add_months(current, offset)
+        name = partition_name(month)
+        try:
+            # One transaction per partition so a single failure (e.g. rows for
+            # that month already sitting in the DEFAULT partition) doesn't undo the rest
+            with db.engine.begin() as conn:
+                create_month_partition(conn, month)
+            report["partitions"].append(name)
+        except Exception as e:
+            report["errors"][name] = str(e)
+    return report
+
+
+def table_kind(conn, table_name: str):
+    """pg_class relkind of a table: 'p' partitioned, 'r' plain table, None if missing."""
+    return conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table_name)"),
+        {"table_name": table_name}
+    ).scalar()
+
+
+def create_arduino_data(conn):
+    """Creates the partitioned parent, its DEFAULT partition and the hub/time index."""
+    ARDUINO_DATA.create(conn, checkfirst=True)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {ARDUINO_DATA_TABLE}_default PARTITION OF {ARDUINO_DATA_TABLE} DEFAULT"
+    ))
+    # Declared on the parent, so it is created on every current and future partition
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS {ARDUINO_DATA_HUB_TIME_INDEX} "
+        f"ON {ARDUINO_DATA_TABLE} (sensor_hub_id, timestamp DESC)"
+    ))
+
+
+def create_rollups(conn):
+    """Creates the rollup tables and their stats views."""
+    for granularity, table in ROLLUP_TABLES.items():
+        table.create(conn, checkfirst=True)
+        conn.execute(text(_stats_view_sql(granularity)))
+
+
+def ensure_sensor_schema(db):
+    """
+    Creates the sensor tables and upcoming partitions. Idempotent. Errors
+    are logged rather than raised so the app still starts.
+    """
+    try:
+        with db.engine.begin() as conn:
+            if table_kind(conn, ARDUINO_DATA_TABLE) == "r":
+                print(f"{ARDUINO_DATA_TABLE} is not partitioned yet. "
+                      f"Run `python -m app.postgres.migrations arduino_data` to migrate it.")
+                return None
+            create_arduino_data(conn)
+            create_rollups(conn)
+        report = ensure_partitions(db)
+        for name, error in report["errors"].items():
+            print(f"Could not create partition {name}: {error}")
+        return report
+    except Exception as e:
+        print(f"Error ensuring sensor schema: {e}")
+
+
+if __name__ == "__main__":
+    from app.postgres.rds import RDS_POSTGRES_DB
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "ensure":
+        print(ensure_sensor_schema(RDS_POSTGRES_DB))
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,77 @@
+"""
+Fixed statistical profile of a hub's sensor metrics, computed in one
+parameterized query instead of LLM-generated SQL.
+"""
+import os
+from dotenv import load_dotenv
+from app.postgres.schema import ARDUINO_DATA_TABLE, SENSOR_METRICS
+load_dotenv()
+
+
+_UNPIVOT = ", ".join(f"('{metric}', {metric})" for metric in SENSOR_METRICS)
+
+# Built once at import; only :sensor_hub_id and :window_days vary per call.
+# z_score compares the latest reading with the window mean, trend_per_day is
+# the least-squares slope in units per day, and the deltas compare the latest
+# reading with the last one at least 1h / 24h older.
+SENSOR_PROFILE_SQL = f"""
+    WITH readings AS (
+        SELECT d.timestamp, m.metric, m.value
+        FROM {ARDUINO_DATA_TABLE} d
+        CROSS JOIN LATERAL (VALUES {_UNPIVOT}) AS m(metric, value)
+        WHERE d.sensor_hub_id = :sensor_hub_id
+          AND d.timestamp >= now() - make_interval(days => :window_days)
+          AND m.value IS NOT NULL
+    ),
+    latest AS (
+        SELECT DISTINCT ON (metric) metric, value AS current_value, timestamp AS current_at
+        FROM readings
+        ORDER BY metric, timestamp DESC
+    ),
+    stats AS (
+        SELECT metric,
+               count(*) AS samples,
+               avg(value) AS mean,
+               stddev_samp(value) AS stddev,
+               min(value) AS min_value,
+               max(value) AS max_value,
+               regr_slope(value, extract(epoch FROM timestamp) / 86400) AS trend_per_day
+        FROM readings
+        GROUP BY metric
+    )
+    SELECT s.metric,
+           l.current_value,
+           l.current_at,
+           s.samples,
+           s.mean,
+           s.stddev,
+           (l.current_value - s.mean) / NULLIF(s.stddev, 0) AS z_score,
+           s.min_value,
+           s.max_value,
+           s.trend_per_day,
+           l.current_value - (
+               SELECT r.value FROM readings r
+               WHERE r.metric = l.metric AND r.timestamp <= l.current_at - interval '1 hour'
+               ORDER BY r.timestamp DESC LIMIT 1
+           ) AS delta_1h,
+           l.current_value - (
+               SELECT r.value FROM readings r
+               WHERE r.metric = l.metric AND r.timestamp <= l.current_at - interval '24 hours'
+               ORDER BY r.timestamp DESC LIMIT 1
+           ) AS delta_24h
+    FROM stats s
+    JOIN latest l USING (metric)
+    ORDER BY s.metric
+"""
+
+
+def query_sensor_profile(db, sensor_hub_id: str, window_days: int = None):
+    """
+    Per-metric current value, mean, stddev, z-score, min/max, trend slope and
+    recent deltas over the last `window_days` days (SENSOR_PROFILE_WINDOW_DAYS, default 30).
+
+    Returns:
+        tuple: (columns, rows) like RDSPostgresDB.query_data, one row per metric.
+    """
+    window_days = window_days or int(os.getenv("SENSOR_PROFILE_WINDOW_DAYS", "30"))
+    return db.query_data(SENSOR_PROFILE_SQL, {"sensor_hub_id": sensor_hub_id, "window_days": window_days})
@@ -0,0 +1,251 @@
+"""
+Read paths over `arduino_data` for the sensor data endpoints: keyset
+pagination, downsampling for charts and streaming exports. All queries filter on
+(sensor_hub_id, timestamp) so they are served by the hub/time index and
+partition pruning.
+"""
+import os
+import io
+import csv
+import json
+import base64
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from app.postgres.schema import ARDUINO_DATA_TABLE, SENSOR_METRICS
+load_dotenv()
+
+
+SENSOR_COLUMNS = ("timestamp", "sensor_hub_id") + SENSOR_METRICS
+DOWNSAMPLE_METHODS = ("bucket", "lttb")
+
+
+def select_columns(columns: Optional[List[str]]) -> List[str]:
+    """
+    Validates requested columns against the whitelist. `timestamp` is always
+    returned first since pagination and charts are keyed on it.
+    """
+    if not columns:
+        return list(SENSOR_COLUMNS)
+    unknown = [col for col in columns if col not in SENSOR_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}. Allowed: {', '.join(SENSOR_COLUMNS)}")
+    return ["timestamp"] + [col for col in dict.fromkeys(columns) if col != "timestamp"]
+
+
+def encode_cursor(timestamp, row_id: str) -> str:
+    payload = json.dumps({"t": timestamp.isoformat(), "id": row_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return payload["t"], payload["id"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def _window(start, end, params: dict) -> List[str]:
+    where = ["sensor_hub_id = :sensor_hub_id"]
+    if start:
+        where.append("timestamp >= CAST(:start AS timestamptz)")
+        params["start"] = start
+    if end:
+        where.append("timestamp < CAST(:end AS timestamptz)")
+        params["end"] = end
+    return where
+
+
+def query_sensor_page(db, sensor_hub_id: str, columns: List[str] = None, start=None, end=None,
+                      limit: int = None, cursor: str = None, order: str = "desc"):
+    """
+    One page of raw readings ordered by (timestamp, id). `cursor` is the
+    `next_cursor` of the previous page; seeking past it keeps every page as
+    cheap as the first, unlike OFFSET.
+
+    Returns:
+        tuple: (columns, rows, next_cursor). next_cursor is None on the last page.
+    """
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be 'asc' or 'desc'")
+    max_limit = int(os.getenv("SENSOR_PAGE_MAX_SIZE", "5000"))
+    limit = min(int(limit or os.getenv("SENSOR_PAGE_SIZE", "500")), max_limit)
+    columns = select_columns(columns)
+
+    params = {"sensor_hub_id": sensor_hub_id, "limit": limit + 1}
+    where = _window(start, end, params)
+    if cursor:
+        params["cursor_ts"], params["cursor_id"] = decode_cursor(cursor)
+        comparison = "<" if order == "desc" else ">"
+        where.append(f"(timestamp, id) {comparison} (CAST(:cursor_ts AS timestamptz), :cursor_id)")
+
+    direction = order.upper()
+    query = (
+        f"SELECT {', '.join(columns)}, id FROM {ARDUINO_DATA_TABLE} WHERE {' AND '.join(where)} "
+        f"ORDER BY timestamp {direction}, id {direction} LIMIT :limit"
+    )
+    _, rows = db.query_data(query, params)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0], rows[-1][-1])
+    return columns, [row[:-1] for row in rows], next_cursor
+
+
+def query_sensor_buckets(db, sensor_hub_id: str, points: int, columns: List[str] = None, start=None, end=None):
+    """
+    Downsamples to at most `points` rows by averaging the metrics over equal
+    time buckets spanning the window (the hub's full history when unbounded).
+    Each row's timestamp is its bucket start.
+    """
+    metrics = [col for col in select_columns(columns) if col in SENSOR_METRICS]
+    params = {"sensor_hub_id": sensor_hub_id, "points": points}
+    where = " AND ".join(_window(start, end, params))
+    averages = "".join(f", avg({metric}) AS {metric}" for metric in metrics)
+    query = f"""
+        WITH bounds AS (
+            SELECT min(extract(epoch FROM timestamp)) AS lo,
+                   GREATEST((max(extract(epoch FROM timestamp)) - min(extract(epoch FROM timestamp))) / :points, 1) AS width
+            FROM {ARDUINO_DATA_TABLE} WHERE {where}
+        )
+        SELECT to_timestamp(bounds.lo + LEAST(floor((extract(epoch FROM timestamp) - bounds.lo) / bounds.width), :points - 1) * bounds.width) AS timestamp
+               {averages}
+        FROM {ARDUINO_DATA_TABLE}, bounds
+        WHERE {where}
+        GROUP BY 1
+        ORDER BY 1
+    """
+    return db.query_data(query, params)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points that keep
+    the visual shape of the (x, y) series. First and last points are kept.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    indices = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        indices.append(a)
+    indices.append(n - 1)
+    return indices
+
+
+def query_sensor_lttb(db, sensor_hub_id: str, points: int, columns: List[str] = None, start=None, end=None):
+    """
+    Downsamples to `points` raw readings picked with LTTB on the first
+    requested metric, so peaks and dips of that series survive.
+
+    The window is first reduced in SQL: it is split into `points` *
+    SENSOR_LTTB_OVERSAMPLE (default 4) equal time buckets and only the
+    readings holding each bucket's min and max are returned. LTTB then runs
+    on at most twice that many candidates, whatever the window size.
+    """
+    columns = select_columns(columns)
+    metrics = [col for col in columns if col in SENSOR_METRICS]
+    if not metrics:
+        raise ValueError("LTTB downsampling needs at least one metric column")
+    metric = metrics[0]
+    fine_buckets = points * int(os.getenv("SENSOR_LTTB_OVERSAMPLE", "4"))
+    params = {"sensor_hub_id": sensor_hub_id, "buckets": fine_buckets}
+    where = " AND ".join(_window(start, end, params) + [f"{metric} IS NOT NULL"])
+    selected = ", ".join(columns)
+    query = f"""
+        WITH bounds AS (
+            SELECT min(extract(epoch FROM timestamp)) AS lo,
+                   GREATEST((max(extract(epoch FROM timestamp)) - min(extract(epoch FROM timestamp))) / :buckets, 1) AS width
+            FROM {ARDUINO_DATA_TABLE} WHERE {where}
+        ),
+        ranked AS (
+            SELECT {selected},
+                   row_number() OVER (PARTITION BY bucket ORDER BY {metric} ASC, timestamp) AS min_rank,
+                   row_number() OVER (PARTITION BY bucket ORDER BY {metric} DESC, timestamp) AS max_rank
+            FROM (
+                SELECT {selected}, floor((extract(epoch FROM timestamp) - bounds.lo) / bounds.width) AS bucket
+                FROM {ARDUINO_DATA_TABLE}, bounds
+                WHERE {where}
+            ) bucketed
+        )
+        SELECT {selected} FROM ranked
+        WHERE min_rank = 1 OR max_rank = 1
+        ORDER BY timestamp
+    """
+    columns, rows = db.query_data(query, params)
+    if not rows:
+        return columns, rows
+    x = np.array([row[0].timestamp() for row in rows])
+    y = np.array([row[columns.index(metric)] for row in rows], dtype=float)
+    return columns, [rows[i] for i in lttb_indices(x, y, points)]
+
+
+def query_sensor_downsampled(db, sensor_hub_id: str, points: int, method: str = "bucket",
+                             columns: List[str] = None, start=None, end=None):
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"method must be one of: {', '.join(DOWNSAMPLE_METHODS)}")
+    if points < 3:
+        raise ValueError("points must be at least 3")
+    if method == "lttb":
+        return query_sensor_lttb(db, sensor_hub_id, points, columns, start, end)
+    return query_sensor_buckets(db, sensor_hub_id, points, columns, start, end)
+
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_sensor_rows(db, sensor_hub_id: str, fmt: str = "ndjson", columns: List[str] = None,
+                       start=None, end=None) -> Iterator[str]:
+    """
+    Streams the readings of a hub, oldest first, as NDJSON lines or CSV
+    (header first). Rows come from a server-side cursor, so memory stays
+    constant whatever the size of the history.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    columns = select_columns(columns)
+    params = {"sensor_hub_id": sensor_hub_id}
+    where = _window(start, end, params)
+    query = (
+        f"SELECT {', '.join(columns)} FROM {ARDUINO_DATA_TABLE} "
+        f"WHERE {' AND '.join(where)} ORDER BY timestamp, id"
+    )
+    rows = db.stream_query(query, params)
+    columns = next(rows)
+
+    if fmt == "ndjson":
+        for row in rows:
+            yield json.dumps(dict(zip(columns, map(_export_value, row)))) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_export_value(value) for value in row])
+        # Flush the buffer into reasonably sized chunks instead of one write per row
+        if buffer.tell() > 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
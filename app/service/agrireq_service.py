@@ -1,10 +1,20 @@
+"""
+Crop-ideal requirements per crop, location and month.
+
+Usage:
+    python -m app.service.agrireq_service prewarm [months_ahead]
+"""
 from app.llms.openai import LangchainOpenaiJsonEngine
+from app.mongo.agri_handlers import CROP_REQUIREMENTS_CACHE_HANDLER, FIELD_HANDLER
+from app.service.geocoding_service import REVERSE_GEOCODER
 from dotenv import load_dotenv
 import os
+import sys
+import json
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any
-from geopy.geocoders import Nominatim
 from datetime import datetime, timedelta
+from app.utils.lazy import lazy_service
 load_dotenv() 
 
 
@@ -44,7 +54,19 @@ class AgricultureRequirements(BaseModel):
 
 
 class AgricultureInfoGenerator:
+    """
+    The requirements only depend on the crop, the coarse region and the month,
+    so they are cached in Mongo per (crop type, region cell, month, model) for
+    CROP_REQUIREMENTS_CACHE_TTL_DAYS (default 30). A region cell is the lat/lon
+    rounded to CROP_REQUIREMENTS_CELL_DEGREES (default 0.5). Disable with
+    CROP_REQUIREMENTS_CACHE=off.
+    """
     def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0.7):
+        self.model_name = model_name
+        self.cell_degrees = float(os.getenv("CROP_REQUIREMENTS_CELL_DEGREES", "0.5"))
+        self.cache_ttl_seconds = int(float(os.getenv("CROP_REQUIREMENTS_CACHE_TTL_DAYS", "30")) * 86400)
+        self.cache_enabled = os.getenv("CROP_REQUIREMENTS_CACHE", "on").lower() != "off"
+        self.cache_handler = CROP_REQUIREMENTS_CACHE_HANDLER
         self.engine = LangchainOpenaiJsonEngine(
             model_name=model_name,
             temperature=temperature,
@@ -57,22 +79,106 @@ Ensure that the information is practical and applicable to the specified locatio
 State the each requirement with relevant metric and unit of measurement where applicable.
 """
         )
-        self.geolocator = Nominatim(user_agent="HarvestAI")
+        self.geocoder = REVERSE_GEOCODER
 
-    def generate_requirements(self, lat:float, lon:float, crop_type:str) -> Dict[str, Any]:
-        lat_lon = f"{lat}, {lon}"
-        address = self.geolocator.reverse(lat_lon)
-        # From current date , retrieve the month
-        current_date = datetime.now()
-        month = current_date.strftime("%B")
+    def region_cell(self, lat: float, lon: float):
+        """Center of the grid cell containing (lat, lon)."""
+        def snap(value):
+            return round(round(float(value) / self.cell_degrees) * self.cell_degrees, 6)
+        return snap(lat), snap(lon)
+
+    def cache_key(self, lat: float, lon: float, crop_type: str, month: str) -> str:
+        cell_lat, cell_lon = self.region_cell(lat, lon)
+        return f"{crop_type.strip().lower()}|{cell_lat}|{cell_lon}|{month}|{self.model_name}"
+
+    def _generate(self, lat: float, lon: float, crop_type: str, month: str):
+        # None when geocoding failed: the prompt then only has the coordinates
+        address = self.geocoder.resolve(lat, lon)
 
         # Generate agricultural requirements using the engine
-        prompt = f"User: Generate agricultural requirements for {crop_type} at {address} in {month}."
+        prompt = f"User: Generate agricultural requirements for {crop_type} at {address or f'{lat}, {lon}'} in {month}."
         print(f"Prompt: {prompt}")
         result = self.engine.run(prompt)[0]
-        return result
-    
-
+        return result, address
 
+    def generate_requirements(self, lat:float, lon:float, crop_type:str, month: str = None) -> Dict[str, Any]:
+        # From current date , retrieve the month
+        month = month or datetime.now().strftime("%B")
+        if not self.cache_enabled:
+            return self._generate(lat, lon, crop_type, month)[0]
+
+        key = self.cache_key(lat, lon, crop_type, month)
+        try:
+            cached = self.cache_handler.get_requirements(key)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            print(f"Error reading crop requirements cache: {e}")
+
+        # Geocode the cell center so the cached answer holds for the whole cell
+        cell_lat, cell_lon = self.region_cell(lat, lon)
+        result, address = self._generate(cell_lat, cell_lon, crop_type, month)
+        if address is None:
+            # Built without knowing the region: don't pin it for the whole TTL
+            return result
+        try:
+            self.cache_handler.save_requirements(key, result, self.cache_ttl_seconds, {
+                "crop_type": crop_type.strip().lower(),
+                "latitude": cell_lat,
+                "longitude": cell_lon,
+                "month": month,
+                "model_name": self.model_name,
+                "address": address,
+            })
+        except Exception as e:
+            print(f"Error writing crop requirements cache: {e}")
+        return result
 
-AGRICULTURAL_INFO_GENERATOR = AgricultureInfoGenerator()
\ No newline at end of file
+    def prewarm(self, months_ahead: int = 0) -> Dict[str, Any]:
+        """
+        Fills the cache for every registered field, for the current month and
+        the next `months_ahead` months. Fields sharing a cache key are generated once.
+
+        Returns:
+            dict: Number of fields, distinct keys, keys generated, and errors per key.
+        """
+        fields = FIELD_HANDLER.get_by_query({}, {"field_location": 1, "crop_type": 1})
+        today = datetime.now().replace(day=1)
+        months = []
+        for i in range(months_ahead + 1):
+            months.append(today.strftime("%B"))
+            today = (today + timedelta(days=32)).replace(day=1)
+
+        targets = {}
+        for field in fields:
+            location = field.get('field_location') or {}
+            if not field.get('crop_type') or location.get('latitude') is None or location.get('longitude') is None:
+                continue
+            for month in months:
+                key = self.cache_key(location['latitude'], location['longitude'], field['crop_type'], month)
+                targets.setdefault(key, (location['latitude'], location['longitude'], field['crop_type'], month))
+
+        report = {"fields": len(fields), "keys": len(targets), "generated": 0, "errors": {}}
+        for key, (lat, lon, crop_type, month) in targets.items():
+            try:
+                if self.cache_handler.get_requirements(key) is None:
+                    self.generate_requirements(lat, lon, crop_type, month)
+                    report["generated"] += 1
+            except Exception as e:
+                report["errors"][key] = str(e)
+        return report
+
+
+
+
+AGRICULTURAL_INFO_GENERATOR = lazy_service("agricultural_info_generator", AgricultureInfoGenerator)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "prewarm":
+        months_ahead = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+        print(json.dumps(AGRICULTURAL_INFO_GENERATOR.prewarm(months_ahead), indent=2))
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -2,14 +2,16 @@ from app.llms.openai import LangchainOpenaiJsonEngine
 from dotenv import load_dotenv
 import os
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
-from geopy.geocoders import Nominatim
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Callable, Tuple
 from datetime import datetime, timedelta
 
 from app.service.agrireq_service import AGRICULTURAL_INFO_GENERATOR
 from app.service.sensor_analysis import SENSOR_SQL_LLM_ENGINE
 from app.service.weather_service import TOMORROW_WEATHER_SERVICE
 from app.mongo.agri_handlers import ALERT_STORAGE_HANDLER
+from app.utils.lazy import lazy_service
 load_dotenv()
 
 
@@ -35,20 +37,44 @@ class AgriActions(BaseModel):
         description="List of actions to be taken."
     )
 
+class BucketActions(BaseModel):
+    """
+    Actions suggested for one weather bucket.
+    """
+    bucket: str = Field(
+        ...,
+        description="Name of the weather bucket, exactly as given, e.g. 'rain'."
+    )
+    actions: List[AgriAction] = Field(
+        ...,
+        description="List of actions to be taken for this bucket."
+    )
 
+class BucketedAgriActions(BaseModel):
+    """
+    Actions for every weather bucket, returned in a single response.
+    """
+    buckets: List[BucketActions] = Field(
+        ...,
+        description="One entry per weather bucket."
+    )
 
 
-
-
+ACTION_SUGGESTION_MODES = ("sequential", "concurrent", "single")
 
 
 class AgricultureActionSuggestor:
+    """
+    Suggests actions per weather bucket. Modes:
+    - sequential: one LLM call per bucket, one after another
+    - concurrent: the same calls batched, at most ACTION_SUGGESTION_CONCURRENCY at once (default)
+    - single: one LLM call returning the actions of every bucket
+    The mode defaults to ACTION_SUGGESTION_MODE.
+    """
     def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0.7):
-        self.engine = LangchainOpenaiJsonEngine(
-            model_name=model_name,
-            temperature=temperature,
-            sampleBaseModel=AgriActions,
-            systemPromptText="""You are an expert in agriculture and farming practices.
+        self.mode = os.getenv("ACTION_SUGGESTION_MODE", "concurrent")
+        self.max_concurrency = int(os.getenv("ACTION_SUGGESTION_CONCURRENCY", "3"))
+        self.system_prompt = """You are an expert in agriculture and farming practices.
 Your task is to suggest actions based on agricultural insights.
 You will receive three types of information: crop-ideal situation, sensor alerts, and weather buckets.
 - crop-ideal situation: The ideal conditions for the crop, including nutrient requirements, soil type, irrigation needs, pest management, and suitable weather conditions.
@@ -62,10 +88,43 @@ Instructions:
 - Only suggest actions which are highlighted in the sensor alerts and weather buckets. Don't suggest all ideal actions.
 - Only suggest actions that can be taken immediately or in the near future based on the current conditions.
 - Return an empty list if no actions are suggested.
+"""
+        self.engine = LangchainOpenaiJsonEngine(
+            model_name=model_name,
+            temperature=temperature,
+            sampleBaseModel=AgriActions,
+            systemPromptText=self.system_prompt
+        )
+        self.single_call_engine = LangchainOpenaiJsonEngine(
+            model_name=model_name,
+            temperature=temperature,
+            sampleBaseModel=BucketedAgriActions,
+            systemPromptText=self.system_prompt + """- You will receive several weather buckets. Return one entry per bucket, using the bucket name exactly as given.
 """
         )
 
-    def suggest_actions(self, crop_ideal: Dict[str, Any], sensor_alerts: List[str], weather_buckets: Dict[str, str]) -> Dict[str, List[AgriAction]]:
+    def _bucket_actions(self, weather_buckets: Dict[str, str], header_prompt: str, mode: str) -> Dict[str, list]:
+        if mode == "single":
+            buckets_text = "\n\n".join(f"Weather bucket '{w_key}':\n{w_value}" for w_key, w_value in weather_buckets.items())
+            prompt = f"{header_prompt}\n{buckets_text}\n\nNow suggest actions for each weather bucket based on the above information."
+            result = self.single_call_engine.run(prompt)[0]
+            by_bucket = {entry.bucket: entry.actions for entry in result.get('buckets', [])}
+            return {w_key: by_bucket.get(w_key, []) for w_key in weather_buckets}
+
+        prompts = [
+            f"{header_prompt}\n{w_value}\n\nNow suggest actions based on the above information."
+            for w_value in weather_buckets.values()
+        ]
+        if mode == "concurrent":
+            results = self.engine.run_batch(prompts, max_concurrency=self.max_concurrency)
+        else:
+            results = [self.engine.run(prompt)[0] for prompt in prompts]
+        return {w_key: result.get('actions', []) for w_key, result in zip(weather_buckets, results)}
+
+    def suggest_actions(self, crop_ideal: Dict[str, Any], sensor_alerts: List[str], weather_buckets: Dict[str, str], mode: str = None) -> Dict[str, List[AgriAction]]:
+        mode = mode or self.mode
+        if mode not in ACTION_SUGGESTION_MODES:
+            raise ValueError(f"Unknown mode '{mode}'. Use one of: {', '.join(ACTION_SUGGESTION_MODES)}")
         # Generate actions using the engine
         crop_ideal_text = '\n- '.join([f"{key}: {value}" for key, value in crop_ideal.items()])
         sensor_alerts_text = '\n- '.join(sensor_alerts)
@@ -76,17 +135,15 @@ Instructions:
         
         actions = {}
         timestamp = datetime.now().isoformat()
-        for w_key, w_value in weather_buckets.items():
-            prompt = f"{header_prompt}\n{w_value}\n\nNow suggest actions based on the above information."
-            result = self.engine.run(prompt)[0]
-            actions[w_key] = result.get('actions', []) 
+        bucket_actions = self._bucket_actions(weather_buckets, header_prompt, mode) if weather_buckets else {}
+        for w_key, w_actions in bucket_actions.items():
             # convert to list of dict
             actions[w_key] = [{
                 **x.dict(),
                 'timestamp': timestamp,
                 'alert_id': f"alert_{w_key}_{i}_{timestamp.replace(':', '-')}",
                 "type": w_key
-                } for i, x in enumerate(actions[w_key])] if isinstance(actions[w_key], list) else []
+                } for i, x in enumerate(w_actions)] if isinstance(w_actions, list) else []
         actions['sensor_alerts'] = [{
             'timestamp': timestamp,
             'alert_id': f"alert_sensor_{i}_{timestamp.replace(':', '-')}",
@@ -98,40 +155,93 @@ Instructions:
 
 
 
-AGRICULTURE_ACTION_SUGGESTOR = AgricultureActionSuggestor()
+AGRICULTURE_ACTION_SUGGESTOR = lazy_service("action_suggestor", AgricultureActionSuggestor)
+
+# Per-stage time budgets (seconds) of the action suggestion pipeline
+PIPELINE_STAGE_TIMEOUTS = {
+    "crop_ideal": float(os.getenv("ALERT_CROP_STAGE_TIMEOUT_SECONDS", "60")),
+    "sensor_alerts": float(os.getenv("ALERT_SENSOR_STAGE_TIMEOUT_SECONDS", "90")),
+    "weather_buckets": float(os.getenv("ALERT_WEATHER_STAGE_TIMEOUT_SECONDS", "30")),
+}
+
+
+def run_pipeline_stages(stages: Dict[str, Tuple[Callable[[], Any], Any]], failed: List[str] = None) -> Dict[str, Any]:
+    """
+    Starts independent stages at once and joins them. Each stage is
+    `name: (callable, fallback)`; a stage that raises or exceeds its
+    PIPELINE_STAGE_TIMEOUTS budget yields its fallback, so the pipeline
+    continues with partial results. The names of those stages are appended
+    to `failed` when given.
+    """
+    failed = [] if failed is None else failed
+    executor = ThreadPoolExecutor(max_workers=len(stages))
+    started = time.monotonic()
+    futures = {name: executor.submit(fn) for name, (fn, _) in stages.items()}
+    results = {}
+    try:
+        for name, future in futures.items():
+            remaining = PIPELINE_STAGE_TIMEOUTS.get(name, 60) - (time.monotonic() - started)
+            try:
+                results[name] = future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                print(f"Stage {name} timed out, continuing without it.")
+                results[name] = stages[name][1]
+                failed.append(name)
+            except Exception as e:
+                print(f"Stage {name} failed ({e}), continuing without it.")
+                results[name] = stages[name][1]
+                failed.append(name)
+    finally:
+        # Don't wait for timed-out stages
+        executor.shutdown(wait=False, cancel_futures=True)
+    print(f"Pipeline stages joined in {time.monotonic() - started:.1f}s.")
+    return results
 
 def run_action_suggestion_pipeline(
     latitude: float,
     longitude: float,
     days: int,
     crop_type: str,
-    sensor_hub_id: str
+    sensor_hub_id: str,
+    failed_stages: List[str] = None
 ) -> Dict[str, List]:
     """
     Run the action suggestion pipeline with the provided inputs.
+    Crop requirements, sensor analysis and weather are fetched concurrently
+    and joined before the actions are suggested. Stages that fell back are
+    appended to `failed_stages`; if every stage failed there is nothing to
+    base actions on and RuntimeError is raised.
     
     :param crop_ideal: Ideal conditions for the crop.
     :param sensor_alerts: Current conditions received from on-site sensors.
     :param weather_buckets: Previous-current-future weather conditions.
     :return: Suggested actions based on the inputs.
     """
-    ideal_agri_result = AGRICULTURAL_INFO_GENERATOR.generate_requirements(
-        lat=latitude,
-        lon=longitude,
-        crop_type=crop_type
-    )
-
-    sensor_alerts = SENSOR_SQL_LLM_ENGINE.run_pipeline(
-        task_description="Analyze the sensor data and generate detailed insights about different sensor metrics. Also their interpretation among the lines of agriculture.",
-        sensor_hub_id=sensor_hub_id
-    ).get('insights', [])
-    
-
-    weather_buckets = TOMORROW_WEATHER_SERVICE(
-        latitude=latitude,
-        longitude=longitude,
-        days=days
-    )
+    failed_stages = [] if failed_stages is None else failed_stages
+    stages = run_pipeline_stages({
+        "crop_ideal": (
+            lambda: AGRICULTURAL_INFO_GENERATOR.generate_requirements(lat=latitude, lon=longitude, crop_type=crop_type),
+            {}
+        ),
+        "sensor_alerts": (
+            lambda: SENSOR_SQL_LLM_ENGINE.run_profile(sensor_hub_id=sensor_hub_id).get('insights', []),
+            []
+        ),
+        "weather_buckets": (
+            lambda: TOMORROW_WEATHER_SERVICE(latitude=latitude, longitude=longitude, days=days),
+            {}
+        ),
+    }, failed=failed_stages)
+    ideal_agri_result = stages["crop_ideal"]
+    sensor_alerts = stages["sensor_alerts"]
+    weather_buckets = stages["weather_buckets"]
+    if "error" in weather_buckets:
+        # The weather service reports failures in-band
+        print(f"Weather stage failed: {weather_buckets['error']}")
+        weather_buckets = {}
+        failed_stages.append("weather_buckets")
+    if len(failed_stages) == len(stages):
+        raise RuntimeError(f"Every pipeline stage failed for hub {sensor_hub_id}: {', '.join(failed_stages)}")
 
     actions = AGRICULTURE_ACTION_SUGGESTOR.suggest_actions(
         crop_ideal=ideal_agri_result,
@@ -139,11 +249,12 @@ def run_action_suggestion_pipeline(
         weather_buckets=weather_buckets
     )
 
-    for action_bucket, action_list in actions.items():
-        for action in action_list:
-            ALERT_STORAGE_HANDLER.add_alert({
-                **action,
-                'sensor_hub_id': sensor_hub_id
-            })
+    result = ALERT_STORAGE_HANDLER.add_alerts([
+        {**action, 'sensor_hub_id': sensor_hub_id}
+        for action_list in actions.values()
+        for action in action_list
+    ])
+    for failure in result['failed']:
+        print(f"Failed to store alert {failure['alert_id']}: {failure['error']}")
 
     return actions
@@ -2,9 +2,10 @@ from app.llms.openai import LangchainOpenaiSimpleChatEngine, LangchainOpenaiJson
 from pydantic import BaseModel, Field
 from typing import Dict, Any
 from datetime import datetime
+from app.utils.lazy import lazy_service
 
 
-GENERAL_CHAT_ENGINE = LangchainOpenaiSimpleChatEngine(
+GENERAL_CHAT_ENGINE = lazy_service("general_chat_engine", lambda: LangchainOpenaiSimpleChatEngine(
     model_name="gpt-4o-mini",
     temperature=0.2,
     systemPromptText="""You are a helpful agricultural and financial assistant.
@@ -12,7 +13,7 @@ You will be given user queries related to agriculture or financial topics.
 If user asks about agriculture, provide insights on crops, diseases, and farming practices.
 If user asks about financial topics, provide insights on financial products, services, and advice.
 If user asks about any other topic apart from agriculture and finance, tell them to ask about agriculture or financial topics only.
-""")
+"""))
 
 
 def general_chat_service(query) -> Dict[str, Any]:
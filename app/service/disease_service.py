@@ -3,7 +3,7 @@ from app.llms.openai import LangchainOpenaiJsonEngine
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any
 from datetime import datetime
-from app.llms.gemini import GeminiImageUnderstandingEngine
+from app.utils.lazy import lazy_service
 
 
 class AgriDiseaseAction(BaseModel):
@@ -28,6 +28,8 @@ class DiseasePredictionPipeline:
     Pipeline for predicting agricultural diseases from images.
     """
     def __init__(self):
+        # google-genai is heavy to import; only load it when the pipeline is first used
+        from app.llms.gemini import GeminiImageUnderstandingEngine
         self.img_engine = GeminiImageUnderstandingEngine()
         self.action_engine = LangchainOpenaiJsonEngine(
             model_name="gpt-4o-mini",
@@ -84,4 +86,4 @@ If there is no disease then return is_disease as False and action_body as "No di
         
 
 
-DISEASE_PREDICTION_PIPELINE = DiseasePredictionPipeline()
\ No newline at end of file
+DISEASE_PREDICTION_PIPELINE = lazy_service("disease_prediction", DiseasePredictionPipeline)
\ No newline at end of file
@@ -0,0 +1,281 @@
+"""
+Fleet-wide alert generation: runs the action suggestion pipeline for every
+registered sensor hub, with resumable progress stored in Mongo.
+
+Usage:
+    python -m app.service.fleet_service run [run_id]   # new run, or resume run_id
+    python -m app.service.fleet_service status [run_id]
+"""
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+from app.mongo.agri_handlers import FIELD_HANDLER, FLEET_RUN_HANDLER, FLEET_RUN_ITEM_HANDLER
+from app.service.agrireq_service import AGRICULTURAL_INFO_GENERATOR
+from app.service.alertsugg_service import run_action_suggestion_pipeline
+from app.service.weather_service import TOMORROW_WEATHER_SERVICE
+from app.utils.parallel import map_with_timeouts
+from app.utils.rate_limiter import get_rate_limiter
+load_dotenv()
+
+
+FLEET_WORKERS = int(os.getenv("FLEET_WORKERS", "4"))
+FLEET_HUB_TIMEOUT_SECONDS = float(os.getenv("FLEET_HUB_TIMEOUT_SECONDS", "300"))
+FLEET_MAX_ATTEMPTS = int(os.getenv("FLEET_MAX_ATTEMPTS", "3"))
+# How long a claimed hub stays reserved; past it, another runner may take it over
+FLEET_HUB_LEASE_SECONDS = float(os.getenv("FLEET_HUB_LEASE_SECONDS", str(2 * FLEET_HUB_TIMEOUT_SECONDS)))
+
+# The background run started by the API, if any (one per process). Hubs are
+# claimed atomically in Mongo, so runners in other processes never overlap.
+_ACTIVE_RUN = {"thread": None, "run_id": None}
+_ACTIVE_RUN_LOCK = threading.Lock()
+
+
+def weather_cell(latitude: float, longitude: float) -> str:
+    """Cell of the weather cache (see TomorrowWeather.cache_lookup)."""
+    return f"{int(latitude)}_{int(longitude)}"
+
+
+def enumerate_hubs() -> List[Dict[str, Any]]:
+    """
+    One item per sensor hub, from the first field registered for it (like
+    /alert/trigger-alert). Fields without a hub, location or crop are skipped.
+    """
+    fields = FIELD_HANDLER.get_by_query({}, {"_id": 0, "sensor_hub_id": 1, "field_location": 1, "crop_type": 1})
+    hubs = {}
+    for field in fields:
+        location = field.get('field_location') or {}
+        hub_id = field.get('sensor_hub_id')
+        if not hub_id or hub_id in hubs or not field.get('crop_type') \
+                or location.get('latitude') is None or location.get('longitude') is None:
+            continue
+        hubs[hub_id] = {
+            "sensor_hub_id": hub_id,
+            "latitude": location['latitude'],
+            "longitude": location['longitude'],
+            "crop_type": field['crop_type'],
+        }
+    return list(hubs.values())
+
+
+def create_fleet_run(days: int = 7) -> str:
+    """
+    Registers a new run and its hubs as pending.
+
+    Returns:
+        str: The run id.
+    """
+    run_id = f"fleet_{datetime.utcnow().strftime('%Y-%m-%dT%H-%M-%S')}"
+    hubs = enumerate_hubs()
+    FLEET_RUN_HANDLER.create_run(run_id, {"days": days, "total_hubs": len(hubs)})
+    FLEET_RUN_ITEM_HANDLER.add_run_items(run_id, hubs)
+    return run_id
+
+
+def prewarm_shared_inputs(items: List[Dict[str, Any]], days: int, max_workers: int) -> Dict[str, int]:
+    """
+    Fetches each distinct weather cell and crop-requirement key once, so the
+    per-hub pipelines hit the caches instead of repeating the same calls.
+    Failures are only counted; the hub pipeline retries them on its own.
+    """
+    weather_limiter = get_rate_limiter("tomorrow", default_rate=1)
+    openai_limiter = get_rate_limiter("openai", default_rate=2, default_burst=4)
+
+    cells = {}
+    crop_keys = {}
+    for item in items:
+        cells.setdefault(weather_cell(item['latitude'], item['longitude']), item)
+        key = AGRICULTURAL_INFO_GENERATOR.cache_key(item['latitude'], item['longitude'], item['crop_type'], datetime.now().strftime("%B"))
+        crop_keys.setdefault(key, item)
+
+    def fetch_weather(item):
+        with weather_limiter:
+            result = TOMORROW_WEATHER_SERVICE(latitude=item['latitude'], longitude=item['longitude'], days=days)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return True
+
+    def fetch_crop_requirements(item):
+        with openai_limiter:
+            AGRICULTURAL_INFO_GENERATOR.generate_requirements(lat=item['latitude'], lon=item['longitude'], crop_type=item['crop_type'])
+        return True
+
+    weather_ok = map_with_timeouts(fetch_weather, list(cells.values()), max_workers, FLEET_HUB_TIMEOUT_SECONDS,
+                                   on_error=lambda item, e: print(f"Weather prewarm failed for {item['sensor_hub_id']}: {e}"))
+    crop_ok = map_with_timeouts(fetch_crop_requirements, list(crop_keys.values()), max_workers, FLEET_HUB_TIMEOUT_SECONDS,
+                                on_error=lambda item, e: print(f"Crop requirements prewarm failed for {item['sensor_hub_id']}: {e}"))
+    return {
+        "weather_cells": len(cells),
+        "weather_cells_failed": sum(1 for ok in weather_ok if not ok),
+        "crop_keys": len(crop_keys),
+        "crop_keys_failed": sum(1 for ok in crop_ok if not ok),
+    }
+
+
+def _process_hub(run_id: str, item: Dict[str, Any], days: int, limiter) -> Dict[str, Any]:
+    hub_id = item['sensor_hub_id']
+    claim_id = FLEET_RUN_ITEM_HANDLER.claim_item(run_id, hub_id, FLEET_MAX_ATTEMPTS, FLEET_HUB_LEASE_SECONDS)
+    if not claim_id:
+        # Done, out of attempts, or being processed by another runner
+        return {"sensor_hub_id": hub_id, "skipped": True}
+    started = time.monotonic()
+    failed_stages = []
+    try:
+        # One token per hub: a pipeline run makes a handful of LLM calls
+        with limiter:
+            actions = run_action_suggestion_pipeline(
+                item['latitude'], item['longitude'], days=days, crop_type=item['crop_type'], sensor_hub_id=hub_id,
+                failed_stages=failed_stages
+            )
+    except Exception as e:
+        FLEET_RUN_ITEM_HANDLER.mark_item(run_id, hub_id, "failed", {
+            "error": str(e), "failed_stages": failed_stages, "seconds": time.monotonic() - started
+        }, claim_id)
+        raise
+    alerts = sum(len(action_list) for action_list in actions.values())
+    # Alerts built without some inputs are stored but the hub is not retried, which would duplicate them
+    status = "partial" if failed_stages else "done"
+    FLEET_RUN_ITEM_HANDLER.mark_item(run_id, hub_id, status, {
+        "error": None, "failed_stages": failed_stages, "alerts": alerts, "seconds": time.monotonic() - started
+    }, claim_id)
+    return {"sensor_hub_id": hub_id, "alerts": alerts, "failed_stages": failed_stages}
+
+
+def run_fleet(run_id: str = None, days: int = None, max_workers: int = None) -> Dict[str, Any]:
+    """
+    Runs the alert pipeline for every hub of a run on a bounded worker pool
+    (FLEET_WORKERS, default 4). Without `run_id` a new run is created; with
+    it, the run resumes and only hubs not done yet (and tried fewer than
+    FLEET_MAX_ATTEMPTS times) are processed.
+
+    Hub runs share the "openai" rate limiter and weather fetches the
+    "tomorrow" one (see get_rate_limiter for the env overrides). Each hub is
+    claimed atomically before it runs, so several runners on the same run
+    (API, CLI, other workers) split the hubs instead of repeating them. The
+    pool stops waiting for a hub after FLEET_HUB_TIMEOUT_SECONDS; its claim
+    stays until the hub finishes or FLEET_HUB_LEASE_SECONDS pass.
+
+    Returns:
+        dict: The run status, see fleet_status.
+    """
+    max_workers = max_workers or FLEET_WORKERS
+    if run_id is None:
+        run_id = create_fleet_run(days or 7)
+    run = FLEET_RUN_HANDLER.get_by_id("run_id", run_id)
+    if not run:
+        raise ValueError(f"Fleet run '{run_id}' not found.")
+    days = days or run.get("days", 7)
+
+    items = FLEET_RUN_ITEM_HANDLER.get_unfinished_items(run_id, FLEET_MAX_ATTEMPTS)
+    print(f"Fleet run {run_id}: {len(items)} hubs to process with {max_workers} workers.")
+    now = datetime.utcnow().isoformat()
+    update = {"status": "running", "max_workers": max_workers, "finished_at": None}
+    if run.get("started_at"):
+        update["resumed_at"] = now
+    else:
+        update["started_at"] = now
+    FLEET_RUN_HANDLER.update_run(run_id, update)
+
+    FLEET_RUN_HANDLER.update_run(run_id, prewarm_shared_inputs(items, days, max_workers))
+
+    def on_error(item, e):
+        # Failures are recorded by _process_hub; a timed-out hub keeps its claim
+        # until it finishes or its lease expires
+        print(f"Fleet run {run_id}: hub {item['sensor_hub_id']} failed: {e}")
+
+    limiter = get_rate_limiter("openai", default_rate=2, default_burst=4)
+    map_with_timeouts(lambda item: _process_hub(run_id, item, days, limiter), items, max_workers,
+                      FLEET_HUB_TIMEOUT_SECONDS, on_error=on_error)
+
+    counts = FLEET_RUN_ITEM_HANDLER.run_summary(run_id, failures_limit=0)["counts"]
+    FLEET_RUN_HANDLER.update_run(run_id, {"status": final_run_status(counts), "finished_at": datetime.utcnow().isoformat()})
+    return fleet_status(run_id)
+
+
+def final_run_status(counts: Dict[str, int]) -> str:
+    """
+    done when every hub succeeded with all pipeline stages, failed when no
+    hub produced alerts, partial otherwise (some hubs failed, ran without some
+    stages, or are still held by another runner).
+    """
+    total = sum(counts.values())
+    if counts.get("done", 0) == total:
+        return "done"
+    if counts.get("done", 0) + counts.get("partial", 0) == 0:
+        return "failed"
+    return "partial"
+
+
+def fleet_status(run_id: str = None) -> Dict[str, Any]:
+    """
+    Progress of a run (the latest one by default): item counts per status,
+    throughput, per-hub timings and the latest failures.
+
+    Returns:
+        dict: The run document merged with its summary, or None if there is no run.
+    """
+    run = FLEET_RUN_HANDLER.get_by_id("run_id", run_id) if run_id else FLEET_RUN_HANDLER.get_latest_run()
+    if not run:
+        return None
+    run.pop('_id', None)
+    summary = FLEET_RUN_ITEM_HANDLER.run_summary(run['run_id'])
+    throughput = None
+    if run.get("started_at"):
+        end = datetime.fromisoformat(run["finished_at"]) if run.get("finished_at") else datetime.utcnow()
+        elapsed = (end - datetime.fromisoformat(run["started_at"])).total_seconds()
+        throughput = {
+            "elapsed_seconds": elapsed,
+            "hubs_per_minute": (summary["counts"]["done"] + summary["counts"]["partial"]) / elapsed * 60 if elapsed > 0 else None,
+        }
+    return {
+        **run,
+        **summary,
+        "throughput": throughput,
+        "active_in_this_process": _ACTIVE_RUN["run_id"] == run['run_id'] and is_fleet_run_active(),
+    }
+
+
+def is_fleet_run_active() -> bool:
+    thread = _ACTIVE_RUN["thread"]
+    return thread is not None and thread.is_alive()
+
+
+def start_fleet_run(run_id: str = None, days: int = None, max_workers: int = None) -> str:
+    """
+    Starts (or resumes) a run on a daemon thread and returns its id.
+    Only one run at a time per process. Raises ValueError for an unknown run_id.
+    """
+    with _ACTIVE_RUN_LOCK:
+        if is_fleet_run_active():
+            raise RuntimeError(f"Fleet run {_ACTIVE_RUN['run_id']} is already running.")
+        if run_id and not FLEET_RUN_HANDLER.get_by_id("run_id", run_id):
+            raise ValueError(f"Fleet run '{run_id}' not found.")
+        run_id = run_id or create_fleet_run(days or 7)
+
+        def target():
+            try:
+                run_fleet(run_id, days=days, max_workers=max_workers)
+            except Exception as e:
+                print(f"Fleet run {run_id} failed: {e}")
+                FLEET_RUN_HANDLER.update_run(run_id, {"status": "failed", "error": str(e)})
+
+        thread = threading.Thread(target=target, name=f"fleet-run-{run_id}", daemon=True)
+        _ACTIVE_RUN.update(thread=thread, run_id=run_id)
+        thread.start()
+    return run_id
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    run_id = sys.argv[2] if len(sys.argv) > 2 else None
+    if command == "run":
+        print(json.dumps(run_fleet(run_id), indent=2, default=str))
+    elif command == "status":
+        print(json.dumps(fleet_status(run_id), indent=2, default=str))
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,118 @@
+import os
+import threading
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from app.mongo.agri_handlers import GEOCODE_CACHE_HANDLER
+from app.utils.rate_limiter import get_rate_limiter
+from app.utils.lazy import lazy_service
+load_dotenv()
+
+
+GEOCODER_BACKENDS = ("nominatim", "offline")
+
+
+class ReverseGeocoder:
+    """
+    Reverse-geocodes coordinates to a readable address, cached in memory and
+    in Mongo per cell of coordinates rounded to GEOCODE_CACHE_DECIMALS
+    (default 2, about 1 km).
+
+    Backends (GEOCODER_BACKEND):
+    - nominatim (default): the public Nominatim service through geopy, rate
+      limited to RATE_LIMIT_NOMINATIM_PER_SECOND (default 1) across all
+      processes through a limiter slot stored in Mongo
+    - offline: the optional 'reverse_geocoder' package, which resolves to the
+      nearest populated place and admin regions from a bundled dataset
+    """
+
+    def __init__(self, backend: str = None, decimals: int = None):
+        self.backend = (backend or os.getenv("GEOCODER_BACKEND", "nominatim")).lower()
+        if self.backend not in GEOCODER_BACKENDS:
+            raise ValueError(f"Unknown geocoder backend '{self.backend}'. Use one of: {', '.join(GEOCODER_BACKENDS)}")
+        self.decimals = decimals if decimals is not None else int(os.getenv("GEOCODE_CACHE_DECIMALS", "2"))
+        self.cache_handler = GEOCODE_CACHE_HANDLER
+        self.memory_cache: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        if self.backend == "offline":
+            try:
+                import reverse_geocoder
+            except ImportError as e:
+                raise ImportError("GEOCODER_BACKEND=offline requires the 'reverse_geocoder' package.") from e
+            self.offline_resolver = reverse_geocoder
+        else:
+            from geopy.geocoders import Nominatim
+            self.geolocator = Nominatim(
+                user_agent=os.getenv("GEOCODER_USER_AGENT", "HarvestAI"),
+                timeout=float(os.getenv("GEOCODER_TIMEOUT_SECONDS", "10"))
+            )
+            # Shared across workers and hosts: the usage policy is per application, not per process
+            self.rate_limiter = get_rate_limiter("nominatim", default_rate=1, shared=True)
+
+    def cell(self, lat: float, lon: float):
+        return round(float(lat), self.decimals), round(float(lon), self.decimals)
+
+    def cell_key(self, lat: float, lon: float) -> str:
+        cell_lat, cell_lon = self.cell(lat, lon)
+        return f"{self.backend}|{cell_lat}|{cell_lon}"
+
+    def _resolve_offline(self, lat: float, lon: float):
+        # mode=1 keeps the lookup in this process instead of spawning workers
+        place = self.offline_resolver.search([(lat, lon)], mode=1)[0]
+        parts = [place.get("name"), place.get("admin2"), place.get("admin1"), place.get("cc")]
+        return ", ".join(part for part in parts if part)
+
+    def _resolve_nominatim(self, lat: float, lon: float):
+        with self.rate_limiter:
+            location = self.geolocator.reverse(f"{lat}, {lon}")
+        return location.address if location else None
+
+    def reverse(self, lat: float, lon: float) -> str:
+        """
+        Address of the cell containing (lat, lon). Falls back to the plain
+        coordinates, uncached, when the backend fails or finds nothing.
+        """
+        return self.resolve(lat, lon) or f"{lat}, {lon}"
+
+    def resolve(self, lat: float, lon: float) -> Optional[str]:
+        """
+        Address of the cell containing (lat, lon), or None when the backend
+        fails or finds nothing.
+        """
+        key = self.cell_key(lat, lon)
+        address = self.memory_cache.get(key)
+        if address is not None:
+            return address
+        try:
+            address = self.cache_handler.get_address(key)
+        except Exception as e:
+            print(f"Error reading geocode cache: {e}")
+        if address is not None:
+            with self.lock:
+                self.memory_cache[key] = address
+            return address
+
+        cell_lat, cell_lon = self.cell(lat, lon)
+        try:
+            if self.backend == "offline":
+                address = self._resolve_offline(cell_lat, cell_lon)
+            else:
+                address = self._resolve_nominatim(cell_lat, cell_lon)
+        except Exception as e:
+            print(f"Error reverse-geocoding {cell_lat}, {cell_lon} with {self.backend}: {e}")
+        if not address:
+            return None
+
+        with self.lock:
+            self.memory_cache[key] = address
+        try:
+            self.cache_handler.save_address(key, address, {
+                "latitude": cell_lat,
+                "longitude": cell_lon,
+                "backend": self.backend,
+            })
+        except Exception as e:
+            print(f"Error writing geocode cache: {e}")
+        return address
+
+
+REVERSE_GEOCODER = lazy_service("reverse_geocoder", ReverseGeocoder)
@@ -9,9 +9,10 @@ import requests
 import os
 from app.mongo.agri_handlers import ALERT_STORAGE_HANDLER,AGRI_PRODUCT_SERVICE_SUGGESTION_HANDLER, FIELD_HANDLER
 from app.llms.openai import LangchainOpenaiSimpleChatEngine
+from app.utils.lazy import lazy_service
 
 
-summarizer = LangchainOpenaiSimpleChatEngine(
+summarizer = lazy_service("notification_summarizer", lambda: LangchainOpenaiSimpleChatEngine(
     model_name="gpt-4o-mini",
     temperature="0.1",
     systemPromptText="""You are an AI summarizer. Your task is too summarize a list huge alerts/suggestions into 3-4 lines. Only focus on high or ciritcal or severe ones." \
@@ -19,7 +20,7 @@ Instructions:
     - For alerts focus on the type, severity, and action body.
     - For suggestions focus on the Product name, why it is needed and price.
 """
-)
+))
 
 
 class EmailNotificationService:
@@ -58,11 +59,7 @@ class EmailNotificationService:
         - sensor: 🛠
         - disease: 🦠
         """
-        alerts = ALERT_STORAGE_HANDLER.get_by_query(
-            query={
-                "timestamp": {"$regex": f"^{date}"}
-            }
-        )
+        alerts = ALERT_STORAGE_HANDLER.get_alerts_by_date(date)
         print(len(alerts), "alerts found for date:", date)
         recipient_info = []
 
@@ -115,11 +112,7 @@ class EmailNotificationService:
         emoji at body for products is:  🛒
         emoji at body for services is:  🔧
         """
-        suggestions = AGRI_PRODUCT_SERVICE_SUGGESTION_HANDLER.get_by_query(
-            query={
-                "timestamp": {"$regex": f"^{date}"}
-            }
-        )
+        suggestions = AGRI_PRODUCT_SERVICE_SUGGESTION_HANDLER.get_suggestions_by_date(date)
         recipient_info = []
         print(len(suggestions), "suggestions found for date:", date)
 
@@ -255,4 +248,4 @@ class EmailNotificationService:
 
 
 
-EMAIL_NOTIFICATION_SERVICE = EmailNotificationService()
\ No newline at end of file
+EMAIL_NOTIFICATION_SERVICE = lazy_service("email_notification", EmailNotificationService)
\ No newline at end of file
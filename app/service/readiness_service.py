@@ -0,0 +1,92 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict
+from dotenv import load_dotenv
+from app.utils.lazy import initialized_services
+load_dotenv()
+
+
+def _probe_mongo():
+    from app.mongo.client import get_mongo_client
+    get_mongo_client().admin.command("ping")
+
+
+def _probe_postgres():
+    from app.postgres.rds import RDS_POSTGRES_DB
+    RDS_POSTGRES_DB.ping()
+
+
+PROBES: Dict[str, Callable[[], Any]] = {
+    "mongo": _probe_mongo,
+    "postgres": _probe_postgres,
+}
+
+# Outcome of the background bootstrap, reported by /ready
+BOOTSTRAP_STATUS = {"state": "not started", "started_at": None, "finished_at": None, "errors": {}}
+_BOOTSTRAP_LOCK = threading.Lock()
+_BOOTSTRAP_PID = None
+
+
+def check_readiness(timeout: float = None) -> Dict[str, Any]:
+    """
+    Probes every backend concurrently, each bounded by READINESS_TIMEOUT_SECONDS
+    (default 3).
+
+    Returns:
+        dict: ready flag, per-backend status, bootstrap status and the services created so far.
+    """
+    timeout = timeout or float(os.getenv("READINESS_TIMEOUT_SECONDS", "3"))
+    checks = {}
+    executor = ThreadPoolExecutor(max_workers=len(PROBES))
+    futures = {name: executor.submit(probe) for name, probe in PROBES.items()}
+    for name, future in futures.items():
+        try:
+            future.result(timeout=timeout)
+            checks[name] = {"ok": True}
+        except Exception as e:
+            checks[name] = {"ok": False, "error": str(e) or type(e).__name__}
+    executor.shutdown(wait=False)
+    return {
+        "ready": all(check["ok"] for check in checks.values()),
+        "checks": checks,
+        "bootstrap": BOOTSTRAP_STATUS,
+        "initialized_services": initialized_services(),
+    }
+
+
+def _bootstrap():
+    from app.mongo.indexes import ensure_indexes_on_startup
+    from app.postgres.rds import RDS_POSTGRES_DB
+    from app.postgres.schema import ensure_sensor_schema
+
+    BOOTSTRAP_STATUS.update(state="running", started_at=datetime.utcnow().isoformat())
+    for name, step in (("mongo_indexes", ensure_indexes_on_startup), ("sensor_schema", lambda: ensure_sensor_schema(RDS_POSTGRES_DB))):
+        try:
+            step()
+        except Exception as e:
+            BOOTSTRAP_STATUS["errors"][name] = str(e)
+            print(f"Bootstrap step {name} failed: {e}")
+    BOOTSTRAP_STATUS.update(state="done", finished_at=datetime.utcnow().isoformat())
+
+
+def start_background_bootstrap():
+    """
+    Applies Mongo indexes and the sensor schema on a daemon thread, so the
+    app starts serving immediately even if a backend is slow or down.
+    Runs once per process: the app calls it on the first request, so a
+    pre-fork server (gunicorn --preload) never connects from its master.
+    Disabled with STARTUP_BOOTSTRAP=false.
+    """
+    global _BOOTSTRAP_PID
+    with _BOOTSTRAP_LOCK:
+        if _BOOTSTRAP_PID == os.getpid():
+            return None
+        _BOOTSTRAP_PID = os.getpid()
+    if os.getenv("STARTUP_BOOTSTRAP", "true").lower() != "true":
+        BOOTSTRAP_STATUS["state"] = "disabled"
+        return None
+    thread = threading.Thread(target=_bootstrap, name="startup-bootstrap", daemon=True)
+    thread.start()
+    return thread
@@ -1,4 +1,6 @@
 import os
+import time
+import json
 import hashlib
 from dotenv import load_dotenv
 from sqlalchemy import MetaData, Table, Column, String, text, Integer, Float, DateTime
@@ -9,6 +11,11 @@ import pandas as pd
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any
 from app.postgres.rds import RDS_POSTGRES_DB
+from app.mongo.agri_handlers import SQL_PLAN_CACHE_HANDLER
+from app.utils.parallel import map_with_timeouts
+from app.utils.lazy import lazy_service
+from app.postgres.sensor_profile import query_sensor_profile
+from app.postgres.schema import ARDUINO_DATA, ROLLUP_GRANULARITIES, ensure_sensor_schema, stats_view_name, stats_view_columns
 load_dotenv()
 
 
@@ -16,7 +23,7 @@ load_dotenv()
 class SqlQuery(BaseModel):
     sql_code : str = Field(...,
         description="The SQL code to be executed. It should be a valid SQL query string.",
-        example="SELECT * FROM arduino_data WHERE temperature > 25"
+        example="SELECT * FROM arduino_data WHERE sensor_hub_id = :sensor_hub_id AND temperature > 25"
     )
 
 class Insights(BaseModel):
@@ -28,24 +35,42 @@ class Insights(BaseModel):
 
 
 
+# Every generated SQL must filter the hub through this bind parameter, so
+# one cached plan serves every hub.
+HUB_PARAM = ":sensor_hub_id"
+
+PROFILE_TASK_DESCRIPTION = "Analyze the sensor data and generate detailed insights about different sensor metrics. Also their interpretation among the lines of agriculture."
+
+
 class SensorSqlLlmEngine:
     def __init__(self, model_name="gpt-3.5-turbo", temperature=0.7):
         self.model_name = model_name
         self.temperature = temperature
         self.db = RDS_POSTGRES_DB
-        self.db.create_table("arduino_data", [
-            ("timestamp", String),
-            ("sensor_hub_id", String),
-            ("nitrogen_level", Float),
-            ("phosphorus_level", Float),
-            ("potassium_level", Float),
-            ("temperature", Float),
-            ("humidity", Float),
-            ("ph_level", Float)
-        ])
-        self.schema = self.db.metadata.tables["arduino_data"]
+        ensure_sensor_schema(self.db)
+        self.schema = ARDUINO_DATA
         head_cols, head_rows = self.db.query_data("SELECT * FROM arduino_data LIMIT 5")
         self.head = pd.DataFrame(head_rows, columns=head_cols)
+        self.rollup_views = [stats_view_name(granularity) for granularity in ROLLUP_GRANULARITIES]
+        self.schema_hash = hashlib.sha256(json.dumps([
+            [(col.name, str(col.type)) for col in self.schema.columns],
+            {view: stats_view_columns() for view in self.rollup_views},
+        ]).encode()).hexdigest()
+        self.plan_cache_enabled = os.getenv("SQL_PLAN_CACHE", "on").lower() != "off"
+        # plan key -> (steps, monotonic expiry)
+        self.plan_cache = {}
+        self.plan_cache_ttl_seconds = int(float(os.getenv("SQL_PLAN_CACHE_TTL_DAYS", "7")) * 86400)
+        self.plan_handler = SQL_PLAN_CACHE_HANDLER
+        # Sub-queries are independent, so SQL writing and execution fan out
+        self.max_workers = int(os.getenv("SENSOR_SUBQUERY_WORKERS", "5"))
+        self.subquery_timeout = float(os.getenv("SENSOR_SUBQUERY_TIMEOUT_SECONDS", "60"))
+        self.rollup_description = f"""
+Pre-aggregated summaries are maintained in the views {' and '.join(self.rollup_views)}
+(one row per sensor_hub_id and hourly/daily 'bucket') with the columns:
+{', '.join(stats_view_columns())}
+Prefer these views for min/max/average/standard deviation over hours, days or longer periods;
+query '{self.schema.name}' only for individual readings or the latest values.
+"""
         self.prompt = f"""
 You are an expert SQL developer specializing in PostgreSQL databases hosted on AWS RDS.
 
@@ -54,6 +79,7 @@ The database has a table named '{self.schema.name}' with the following columns:
 
 Here are the first 5 rows of this table to provide context for the data:
 {self.head.to_string(index=False)}
+{self.rollup_description}
 
 Your task is:
 - To translate natural language descriptions into valid, efficient, and optimized PostgreSQL SQL queries.
@@ -94,6 +120,7 @@ You are a data analytics agent responsible for decomposing a complex user reques
 Consider the following database schema:
 Table: {self.schema.name}
 Columns: {', '.join(self.schema.columns.keys())}
+{self.rollup_description}
 
 You have a single tool available (option 0) that converts natural language sub-queries into SQL queries.
 
@@ -125,15 +152,18 @@ You are an expert PostgreSQL developer.
 Given the natural language sub-query:
 \"\"\"{user_query}\"\"\"
 
-Generate a valid, efficient, and optimized PostgreSQL SQL query that retrieves the required data from the '{self.schema.name}' table.
+Generate a valid, efficient, and optimized PostgreSQL SQL query that retrieves the required data from the '{self.schema.name}' table
+or, for aggregates, from the summary views {' / '.join(self.rollup_views)}.
 
 - Use correct column names.
-- Always filter the data first using 'sensor_hub_id' 
+- Always filter the data first with `sensor_hub_id = {HUB_PARAM}`. Write the bind parameter {HUB_PARAM} literally, never a concrete hub id.
+- 'timestamp' is a timestamptz column. Filter time windows with ranges on it (e.g. timestamp >= now() - interval '24 hours'), never with string matching.
 - Write complex queries if needed, but prioritize readability and performance.
 - Do not include any explanation, only output the SQL query.
 - Don't make up any sub-queries or anything that is not related to the database schema.
 - Don't include any function or method calls which is not there in AWS RDS PostgreSQL.
-- Strictly follow the database schema provided. Do not assume any additional columns or tables.
+- Strictly follow the database schema provided. Do not assume any additional columns or tables besides the summary views.
+- Averages over several buckets of a summary view must be weighted by that metric's non-null count, e.g. sum(temperature_avg * temperature_count) / NULLIF(sum(temperature_count), 0). sample_count counts rows, not readings of a metric.
 - Always try to limit the result set to a reasonable size, e.g., using LIMIT 10 or WHERE clauses.
 - Always try to include the average column as I am specifically interested whether the current data is above or below average.
 
@@ -142,10 +172,10 @@ SQL Query:
         result = self.query_gen_engine.run(user_prompt)
         return result[0]
     
-    def run_query(self, sql_query: str):
+    def run_query(self, sql_query: str, params: Dict[str, Any] = None):
         """Executes a SQL query and returns the results."""
         try:
-            columns, data = self.db.query_data(sql_query)
+            columns, data = self.db.query_data(sql_query, params)
             return pd.DataFrame(data, columns=columns)
         except Exception as e:
             raise ValueError(f"Error executing SQL query: {e}")
@@ -174,36 +204,147 @@ Each insight firstly consist of technical terms and then a brief explanation in
         print(f"{len(insights)} insights generated.")
         return insights['insights']
                 
-    def run_pipeline(self, task_description: str, sensor_hub_id: str):
+    def run_profile(self, sensor_hub_id: str, task_description: str = PROFILE_TASK_DESCRIPTION, window_days: int = None):
+        """
+        Insights from the built-in statistical profile (current value, mean,
+        stddev, z-score, trend and recent deltas per metric). One SQL query and
+        a single LLM call for the insights, instead of planning and writing SQL
+        with the LLM. Returns the same shape as `run_pipeline`.
+        """
+        columns, data = query_sensor_profile(self.db, sensor_hub_id, window_days)
+        if not data:
+            print(f"No recent sensor data for hub {sensor_hub_id}.")
+            return {"option_results": [], "insights": []}
+        option_results = [{
+            'option_index': 'profile',
+            'option_name': "Sensor statistics profile",
+            'option_intention': "Per-metric current value, mean, stddev, z-score, trend per day and 1h/24h deltas.",
+            'subquery': "Statistical profile of every sensor metric of the hub",
+            'sql_code': None,
+            'query_result': pd.DataFrame(data, columns=columns),
+        }]
+        print(f"Post-processing sensor profile to generate insights...")
+        insights = self.post_process_results(task_description, option_results)
+        return {
+            "option_results": option_results,
+            "insights": insights
+        }
+
+    def plan_key(self, task_description: str) -> str:
+        return hashlib.sha256(json.dumps([task_description, self.schema_hash, self.model_name]).encode()).hexdigest()
+
+    def generate_plan(self, task_description: str) -> List[Dict[str, Any]]:
+        """Decomposes the task into sub-queries and writes the SQL of each with the LLM."""
         options = self.select_options(task_description)
         print(f"{len(options)} options selected.")
         if not options:
             raise ValueError("No options selected. Please ensure the task description is valid.")
-        option_results = []
         for option in options:
-            obj = {}
-            opt_index = option.option_index
-            sub_query = option.subquery
-            if opt_index in self.options:
-                # print(f"Processing option index: {opt_index} with sub-query: {sub_query[:50]}")
-                callable_result = self.options[opt_index](sub_query+f" WHERE sensor_hub_id = '{sensor_hub_id}'")
-                obj['option_index'] = opt_index
-                obj['option_name'] = self.options[opt_index].option_name
-                obj['option_intention'] = self.options[opt_index].option_intention
-                obj['subquery'] = sub_query
-                obj['sql_code'] = callable_result['sql_code']
-                # print(f"Generated SQL code: {str(obj['sql_code'])[:50]}")
-                print(f"Running SQL query...")
-                try:
-                    query_result = self.run_query(obj['sql_code'])
-                    obj['query_result'] = query_result
-                    print(f"Query executed successfully. Result shape: {query_result.shape}")
-                except ValueError as e:
-                    print(f"Error executing SQL query: {e}")
-                    obj['query_result'] = None
-                option_results.append(obj)
-            else:
-                raise ValueError(f"Invalid option index: {opt_index}")
+            if option.option_index not in self.options:
+                raise ValueError(f"Invalid option index: {option.option_index}")
+
+        def write_sql(option):
+            return self.options[option.option_index](option.subquery)['sql_code']
+
+        def failed(option, e):
+            print(f"Error generating SQL for sub-query '{option.subquery[:50]}': {e}")
+            return None
+
+        sql_codes = map_with_timeouts(write_sql, options, self.max_workers, self.subquery_timeout, failed)
+        return [
+            {'option_index': option.option_index, 'subquery': option.subquery, 'sql_code': sql_code}
+            for option, sql_code in zip(options, sql_codes)
+        ]
+
+    def cached_plan(self, key: str) -> List[Dict[str, Any]]:
+        """Cached steps for a plan key from memory or Mongo, or None."""
+        entry = self.plan_cache.get(key)
+        if entry is not None:
+            steps, expires_at = entry
+            if time.monotonic() < expires_at:
+                return steps
+            self.plan_cache.pop(key, None)
+        try:
+            steps = self.plan_handler.get_plan(key)
+        except Exception as e:
+            print(f"Error reading SQL plan cache: {e}")
+            return None
+        if steps is not None:
+            self.plan_cache[key] = (steps, time.monotonic() + self.plan_cache_ttl_seconds)
+        return steps
+
+    def cache_plan(self, key: str, steps: List[Dict[str, Any]], task_description: str):
+        self.plan_cache[key] = (steps, time.monotonic() + self.plan_cache_ttl_seconds)
+        try:
+            self.plan_handler.save_plan(key, steps, self.plan_cache_ttl_seconds,
+                                        {"task_description": task_description, "model_name": self.model_name})
+        except Exception as e:
+            print(f"Error writing SQL plan cache: {e}")
+
+    def evict_plan(self, key: str):
+        self.plan_cache.pop(key, None)
+        try:
+            self.plan_handler.delete_plan(key)
+        except Exception as e:
+            print(f"Error evicting SQL plan: {e}")
+
+    def _step_result(self, step: Dict[str, Any]) -> Dict[str, Any]:
+        opt_index = step['option_index']
+        return {
+            'option_index': opt_index,
+            'option_name': self.options[opt_index].option_name,
+            'option_intention': self.options[opt_index].option_intention,
+            'subquery': step['subquery'],
+            'sql_code': step['sql_code'],
+            'query_result': None,
+        }
+
+    def run_step(self, step: Dict[str, Any], sensor_hub_id: str) -> Dict[str, Any]:
+        """Runs one plan step for a hub. A failed or unscoped query yields query_result None."""
+        obj = self._step_result(step)
+        if HUB_PARAM not in (step['sql_code'] or ''):
+            # Would read every hub's data
+            print(f"Skipping SQL query not filtered by {HUB_PARAM}.")
+            return obj
+        print(f"Running SQL query...")
+        try:
+            query_result = self.run_query(step['sql_code'], {"sensor_hub_id": sensor_hub_id})
+            obj['query_result'] = query_result
+            print(f"Query executed successfully. Result shape: {query_result.shape}")
+        except ValueError as e:
+            print(f"Error executing SQL query: {e}")
+        return obj
+
+    def run_pipeline(self, task_description: str, sensor_hub_id: str):
+        """
+        LLM-planned analysis for free-form questions; use `run_profile` for the standard trigger.
+
+        Plans are cached per (task, schema hash, model) in memory and in Mongo
+        for SQL_PLAN_CACHE_TTL_DAYS (default 7). A new plan is cached only
+        after every step ran successfully and filters the hub through the bind
+        parameter, so it is valid for any hub. A cached plan with a failing
+        step is evicted and regenerated on the next call.
+        """
+        key = self.plan_key(task_description) if self.plan_cache_enabled else None
+        steps = self.cached_plan(key) if key else None
+        from_cache = steps is not None
+        if not from_cache:
+            steps = self.generate_plan(task_description)
+
+        def failed(step, e):
+            print(f"Error running sub-query '{step['subquery'][:50]}': {e}")
+            return self._step_result(step)
+
+        option_results = map_with_timeouts(
+            lambda step: self.run_step(step, sensor_hub_id), steps, self.max_workers, self.subquery_timeout, failed
+        )
+        if key:
+            succeeded = bool(option_results) and all(result['query_result'] is not None for result in option_results)
+            if from_cache and not succeeded:
+                print("Cached SQL plan has failing steps, evicting it.")
+                self.evict_plan(key)
+            elif not from_cache and succeeded and all(HUB_PARAM in (step['sql_code'] or '') for step in steps):
+                self.cache_plan(key, steps, task_description)
             
         if not option_results:
             raise ValueError("No results generated. Please ensure the options are valid and the SQL queries are correct.")
@@ -216,5 +357,5 @@ Each insight firstly consist of technical terms and then a brief explanation in
         return results
     
 
-SENSOR_SQL_LLM_ENGINE = SensorSqlLlmEngine(model_name="gpt-4o-mini", temperature=0.5)
+SENSOR_SQL_LLM_ENGINE = lazy_service("sensor_sql_llm_engine", lambda: SensorSqlLlmEngine(model_name="gpt-4o-mini", temperature=0.5))
                         
\ No newline at end of file
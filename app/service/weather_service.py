@@ -7,6 +7,7 @@ load_dotenv()
 from typing import List, Dict
 from datetime import datetime
 from app.mongo.agri_handlers import WEATHER_HANDLER
+from app.utils.lazy import lazy_service
 
 
 def format_tomorrow_result(forecasts: List[Dict], recents: List[Dict]) -> Dict[str, str]:
@@ -163,7 +164,11 @@ class TomorrowWeather:
             "forecasts": forecasts,
             "recents": recents
         }
-        WEATHER_HANDLER.add_weather_data(payload)
+        try:
+            WEATHER_HANDLER.add_weather_data(payload)
+        except ValueError as e:
+            # Another request cached the same cell and date first
+            print(f"Weather data already cached: {e}")
 
 
     def __call__(self, latitude, longitude, days, formated=True) -> Dict[str, str]:
@@ -194,4 +199,4 @@ class TomorrowWeather:
         
 
 
-TOMORROW_WEATHER_SERVICE = TomorrowWeather()
\ No newline at end of file
+TOMORROW_WEATHER_SERVICE = lazy_service("tomorrow_weather", TomorrowWeather)
\ No newline at end of file
@@ -1,7 +1,6 @@
-import youtubesearchpython
-
 class YTService:
     def search(self, query, max_results=3):
+        import youtubesearchpython
         videos_search = youtubesearchpython.VideosSearch(query, limit=max_results)
         results = []
         for item in videos_search.result().get("result", []):
@@ -0,0 +1,60 @@
+import threading
+from typing import Any, Callable, Dict
+
+
+# Every lazily created singleton of the app, by name
+SERVICES: Dict[str, "LazyService"] = {}
+
+
+class LazyService:
+    """
+    Stands in for a module-level singleton and builds it on first use, so
+    importing a module never opens connections or builds API clients.
+    Attribute access and calls are forwarded to the real instance.
+    Usage:
+        WEATHER_SERVICE = lazy_service("weather", lambda: WeatherService())
+        WEATHER_SERVICE.fetch(...)  # instance created here
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        object.__setattr__(self, "_lazy_name", name)
+        object.__setattr__(self, "_lazy_factory", factory)
+        object.__setattr__(self, "_lazy_value", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _lazy_instance(self):
+        value = self._lazy_value
+        if value is None:
+            with self._lazy_lock:
+                value = self._lazy_value
+                if value is None:
+                    value = self._lazy_factory()
+                    object.__setattr__(self, "_lazy_value", value)
+        return value
+
+    def _lazy_initialized(self) -> bool:
+        return self._lazy_value is not None
+
+    def __getattr__(self, name):
+        return getattr(self._lazy_instance(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._lazy_instance(), name, value)
+
+    def __call__(self, *args, **kwargs):
+        return self._lazy_instance()(*args, **kwargs)
+
+    def __repr__(self):
+        state = "initialized" if self._lazy_initialized() else "not initialized"
+        return f"<LazyService {self._lazy_name} ({state})>"
+
+
+def lazy_service(name: str, factory: Callable[[], Any]) -> Any:
+    """Registers and returns a lazy singleton under `name`."""
+    service = LazyService(name, factory)
+    SERVICES[name] = service
+    return service
+
+
+def initialized_services():
+    return [name for name, service in SERVICES.items() if service._lazy_initialized()]
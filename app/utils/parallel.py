@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, List, Sequence
+
+
+def map_with_timeouts(
+    fn: Callable[[Any], Any],
+    items: Sequence[Any],
+    max_workers: int,
+    timeout: float,
+    on_error: Callable[[Any, Exception], Any] = lambda item, e: None,
+) -> List[Any]:
+    """
+    Runs `fn(item)` for every item on a bounded thread pool and returns the
+    results in input order. An item that raises, or is still running
+    `timeout` seconds after it started, yields `on_error(item, exception)`
+    instead (a TimeoutError for the latter), so one slow item never holds up
+    the rest. Threads of timed-out items are abandoned, not killed.
+    """
+    if not items:
+        return []
+    results = [None] * len(items)
+    started = [None] * len(items)
+
+    def run(i):
+        started[i] = time.monotonic()
+        return fn(items[i])
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+    futures = {executor.submit(run, i): i for i in range(len(items))}
+    pending = set(futures)
+    try:
+        while pending:
+            now = time.monotonic()
+            remaining = [
+                timeout - (now - started[futures[future]])
+                for future in pending if started[futures[future]] is not None
+            ]
+            done, pending = wait(pending, timeout=max(min(remaining, default=0.05), 0.01), return_when=FIRST_COMPLETED)
+            for future in done:
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    results[i] = on_error(items[i], e)
+
+            now = time.monotonic()
+            for future in list(pending):
+                i = futures[future]
+                if started[i] is not None and now - started[i] >= timeout:
+                    pending.discard(future)
+                    results[i] = on_error(items[i], TimeoutError(f"Timed out after {timeout}s"))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from typing import Any, Dict
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: at most `rate` calls per second on average,
+    with bursts of up to `burst` calls. acquire() blocks until a call is allowed.
+    Limits are per process.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, timeout: float = None) -> bool:
+        """
+        Waits for a token.
+
+        Returns:
+            bool: True once a token was taken, False if `timeout` seconds passed first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None:
+                if now >= deadline:
+                    return False
+                wait = min(wait, deadline - now)
+            time.sleep(wait)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class SharedRateLimiter:
+    """
+    Rate limiter shared by every process and host through Mongo: each call
+    atomically reserves the next slot, `1 / rate` seconds after the previous
+    one, then sleeps until it. Calls are spaced evenly (no bursts). Falls back
+    to a per-process limiter while Mongo is unreachable.
+    """
+
+    def __init__(self, name: str, rate: float):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.name = name
+        self.rate = rate
+        self.fallback = RateLimiter(rate)
+
+    def acquire(self, timeout: float = None) -> bool:
+        """
+        Waits for the next shared slot. `timeout` only applies to the
+        per-process fallback: a reserved shared slot is always waited for.
+        """
+        from app.mongo.agri_handlers import RATE_LIMIT_HANDLER
+        try:
+            wait = RATE_LIMIT_HANDLER.reserve_slot(self.name, 1 / self.rate)
+        except Exception as e:
+            print(f"Shared rate limiter {self.name} unavailable, limiting per process: {e}")
+            return self.fallback.acquire(timeout)
+        if wait:
+            time.sleep(wait)
+        return True
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+# Shared limiters, one per external provider
+RATE_LIMITERS: Dict[str, Any] = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(name: str, default_rate: float, default_burst: int = 1, shared: bool = False):
+    """
+    Returns the limiter for a provider, created on first use.
+    RATE_LIMIT_<NAME>_PER_SECOND and RATE_LIMIT_<NAME>_BURST override the
+    defaults. With `shared` (or RATE_LIMIT_<NAME>_SHARED=true) the limit holds
+    across all workers and hosts (SharedRateLimiter); otherwise it applies per
+    process, so with N workers the provider sees up to N times the rate.
+    Usage:
+        with get_rate_limiter("nominatim", 1, shared=True):
+            geolocator.reverse(...)
+    """
+    with _RATE_LIMITERS_LOCK:
+        limiter = RATE_LIMITERS.get(name)
+        if limiter is None:
+            prefix = f"RATE_LIMIT_{name.upper()}"
+            rate = float(os.getenv(f"{prefix}_PER_SECOND", str(default_rate)))
+            if os.getenv(f"{prefix}_SHARED", str(shared)).lower() == "true":
+                limiter = SharedRateLimiter(name, rate)
+            else:
+                limiter = RateLimiter(
+                    rate=rate,
+                    burst=int(os.getenv(f"{prefix}_BURST", str(default_burst)))
+                )
+            RATE_LIMITERS[name] = limiter
+        return limiter
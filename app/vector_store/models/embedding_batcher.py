@@ -0,0 +1,87 @@
+import os
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used when tiktoken is unavailable."""
+    return len(text) // 4 + 1
+
+
+class EmbeddingBatcher:
+    """
+    Splits a list of texts into request-sized chunks, embeds the chunks
+    concurrently on a bounded worker pool and returns vectors in input order.
+    Throttled or transiently failing chunks are retried with exponential backoff.
+    Usage:
+        batcher = EmbeddingBatcher(embed_fn=lambda chunk: [...])
+        vectors = batcher(["text 1", "text 2", ...])
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[np.ndarray]],
+        max_items: int = None,
+        max_tokens: int = None,
+        max_workers: int = None,
+        max_retries: int = 5,
+        backoff_seconds: float = 1.0,
+        is_retryable: Callable[[Exception], bool] = None,
+        token_counter: Callable[[str], int] = None,
+    ):
+        self.embed_fn = embed_fn
+        self.max_items = max_items or int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "2048"))
+        self.max_tokens = max_tokens or int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "250000"))
+        self.max_workers = max_workers or int(os.getenv("EMBEDDING_BATCH_WORKERS", "4"))
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.is_retryable = is_retryable or (lambda e: True)
+        self.token_counter = token_counter or estimate_tokens
+
+    def split(self, texts: List[str]) -> List[Tuple[int, List[str]]]:
+        """
+        Returns (start offset, chunk) pairs respecting the item and token limits.
+        """
+        chunks = []
+        start, chunk, chunk_tokens = 0, [], 0
+        for i, text in enumerate(texts):
+            tokens = self.token_counter(text)
+            if chunk and (len(chunk) >= self.max_items or chunk_tokens + tokens > self.max_tokens):
+                chunks.append((start, chunk))
+                start, chunk, chunk_tokens = i, [], 0
+            chunk.append(text)
+            chunk_tokens += tokens
+        if chunk:
+            chunks.append((start, chunk))
+        return chunks
+
+    def _embed_with_retry(self, chunk: List[str]) -> List[np.ndarray]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embed_fn(chunk)
+            except Exception as e:
+                if attempt == self.max_retries or not self.is_retryable(e):
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt) * (1 + random.random())
+                print(f"Embedding chunk of {len(chunk)} failed ({e}). Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+    def __call__(self, texts: List[str]) -> List[np.ndarray]:
+        if not texts:
+            return []
+        chunks = self.split(texts)
+        if len(chunks) == 1:
+            return self._embed_with_retry(chunks[0][1])
+
+        vectors = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            futures = [(start, executor.submit(self._embed_with_retry, chunk)) for start, chunk in chunks]
+            for start, future in futures:
+                for offset, vector in enumerate(future.result()):
+                    vectors[start + offset] = vector
+        return vectors
@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by (model, sha256(text)).
+
+    An in-process LRU sits in front of a persistent SQLite file, so identical
+    texts are only embedded once across requests, workers and restarts.
+    Usage:
+        cache = EmbeddingCache()
+        vectors = cache.get_many("text-embedding-ada-002", ["some text"])
+    """
+
+    def __init__(self, path: str = None, max_memory_items: int = None):
+        self.path = path or os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+        self.max_memory_items = max_memory_items or int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._conn = None
+        self._conn_pid = None
+
+    @staticmethod
+    def key(model: str, text: str):
+        return model, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _connection(self):
+        # SQLite connections must not be shared with forked children
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+            """)
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _remember(self, key, vector: np.ndarray):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Returns the cached vector for each text, or None for misses.
+        """
+        keys = [self.key(model, text) for text in texts]
+        results = [None] * len(texts)
+        with self.lock:
+            disk_lookup = {}
+            for i, key in enumerate(keys):
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    results[i] = self.memory[key]
+                    self.memory_hits += 1
+                else:
+                    disk_lookup.setdefault(key[1], []).append(i)
+
+            if disk_lookup:
+                hashes = list(disk_lookup)
+                rows = []
+                conn = self._connection()
+                # Stay well below SQLite's bound-parameter limit
+                for start in range(0, len(hashes), 500):
+                    chunk = hashes[start:start + 500]
+                    placeholders = ", ".join("?" for _ in chunk)
+                    rows.extend(conn.execute(
+                        f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                        [model, *chunk]
+                    ).fetchall())
+                for text_hash, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float64).copy()
+                    self._remember((model, text_hash), vector)
+                    for i in disk_lookup.pop(text_hash):
+                        results[i] = vector
+                        self.disk_hits += 1
+                self.misses += sum(len(indices) for indices in disk_lookup.values())
+        return results
+
+    def set_many(self, model: str, texts: List[str], vectors: List[np.ndarray]):
+        rows = []
+        with self.lock:
+            for text, vector in zip(texts, vectors):
+                vector = np.asarray(vector, dtype=np.float64)
+                key = self.key(model, text)
+                self._remember(key, vector)
+                rows.append((model, key[1], vector.tobytes()))
+            if rows:
+                conn = self._connection()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                    rows
+                )
+                conn.commit()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_items": len(self.memory),
+            }
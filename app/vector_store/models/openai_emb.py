@@ -1,28 +1,83 @@
 import os
 import numpy as np
-from typing import Dict
+from typing import Dict, List
 from dotenv import load_dotenv
+from app.vector_store.models.embedding_cache import EmbeddingCache
+from app.vector_store.models.embedding_batcher import EmbeddingBatcher
+from app.utils.lazy import lazy_service
 load_dotenv()
 
 
-# Check if OPENAI_API_KEY is set
-if not os.getenv("OPENAI_API_KEY"):
-    raise EnvironmentError("OPENAI_API_KEY environment variable is not set.")
-
-
 class OpenAIEmbedder:
     """
     Callable class to generate dense embeddings using OpenAI's embedding API.
+    Embeddings are served from an `EmbeddingCache` when available, so only
+    texts never seen before reach the API.
     Usage:
         embedder = OpenAIEmbedder()
         vector = embedder("sample text")
     """
 
-    def __init__(self, model: str = "text-embedding-ada-002"):
+    def __init__(self, model: str = "text-embedding-ada-002", cache: EmbeddingCache = None):
+        # Check if OPENAI_API_KEY is set
+        if not os.getenv("OPENAI_API_KEY"):
+            raise EnvironmentError("OPENAI_API_KEY environment variable is not set.")
         import openai
         openai.api_key = os.environ.get("OPENAI_API_KEY")
         self.openai = openai
         self.model = model
+        if cache is None and os.getenv("EMBEDDING_CACHE", "on").lower() != "off":
+            cache = EmbeddingCache()
+        self.cache = cache
+        self.api_calls = 0
+        self.batcher = EmbeddingBatcher(
+            embed_fn=self._embed,
+            is_retryable=self._is_retryable,
+            token_counter=self._token_counter()
+        )
+
+    def _token_counter(self):
+        try:
+            import tiktoken
+            encoding = tiktoken.encoding_for_model(self.model)
+            return lambda text: len(encoding.encode(text))
+        except Exception:
+            return None
+
+    def _is_retryable(self, error: Exception) -> bool:
+        retryable = tuple(
+            getattr(self.openai, name)
+            for name in ("RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError")
+            if hasattr(self.openai, name)
+        )
+        return isinstance(error, retryable)
+
+    def _embed(self, texts: List[str]) -> List[np.ndarray]:
+        response = self.openai.embeddings.create(
+            model=self.model,
+            input=texts
+        )
+        self.api_calls += 1
+        return [np.array(item.embedding) for item in response.data]
+
+    def _embed_cached(self, texts: List[str]) -> List[np.ndarray]:
+        if self.cache is None:
+            return self.batcher(texts)
+        vectors = self.cache.get_many(self.model, texts)
+        # Embed each distinct missing text once
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            fresh = dict(zip(missing, self.batcher(missing)))
+            self.cache.set_many(self.model, missing, [fresh[text] for text in missing])
+            vectors = [fresh[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def cache_stats(self) -> Dict:
+        """
+        Returns cache hit/miss counters and the number of embedding API calls.
+        """
+        stats = self.cache.stats() if self.cache is not None else {}
+        return {**stats, "api_calls": self.api_calls, "model": self.model}
 
     def __call__(self, text):
         """
@@ -30,18 +85,12 @@ class OpenAIEmbedder:
         Returns a numpy array for a single string, or a list of numpy arrays for a list of strings.
         """
         if isinstance(text, str):
-            response = self.openai.embeddings.create(
-                model=self.model,
-                input=text
-            )
-            return np.array(response.data[0].embedding)
+            return self._embed_cached([text])[0]
         elif isinstance(text, list) and all(isinstance(t, str) for t in text):
-            response = self.openai.embeddings.create(
-                model=self.model,
-                input=text
-            )
-            return [np.array(item.embedding) for item in response.data]
+            if not text:
+                return []
+            return self._embed_cached(text)
         else:
             raise TypeError("Input must be a string or a list of strings.")
 
-OPENAI_EMBEDDER = OpenAIEmbedder()  # Initialize the embedder instance
\ No newline at end of file
+OPENAI_EMBEDDER = lazy_service("openai_embedder", OpenAIEmbedder)  # Created on first use
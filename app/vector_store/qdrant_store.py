@@ -1,5 +1,5 @@
 import uuid
-from typing import Callable, Union, List, Dict, Any
+from typing import Callable, Union, List, Dict, Any, Tuple
 import numpy as np
 from qdrant_client import QdrantClient, models
 
@@ -61,21 +61,30 @@ class VectorEmbeddingStore:
                     }
                 )
 
-    def _format_point(self, item: Dict[str, Any]) -> models.PointStruct:
-        vector = self.embedder(item['text'])
-        raw_id = item["id"]
-
-        # Normalize ID
+    def _normalize_id(self, raw_id: Union[str, int]) -> Union[str, int]:
         if isinstance(raw_id, str):
             try:
-                point_id = str(uuid.UUID(raw_id))
+                return str(uuid.UUID(raw_id))
             except ValueError:
-                point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, raw_id))
+                return str(uuid.uuid5(uuid.NAMESPACE_DNS, raw_id))
         elif isinstance(raw_id, int):
-            point_id = raw_id
+            return raw_id
         else:
             raise ValueError("Point ID must be str or int")
 
+    def _embed_many(self, texts: List[str]) -> List[Union[np.ndarray, Dict[int, float]]]:
+        """
+        Embeds texts with a single embedder call; the embedder batches the request.
+        """
+        if not texts:
+            return []
+        return self.embedder(texts)
+
+    def _format_point(self, item: Dict[str, Any], vector=None) -> models.PointStruct:
+        if vector is None:
+            vector = self.embedder(item['text'])
+        point_id = self._normalize_id(item["id"])
+
         if isinstance(vector, dict):  # Sparse vector
             indices, values = zip(*vector.items()) if vector else ([], [])
             return models.PointStruct(
@@ -97,9 +106,58 @@ class VectorEmbeddingStore:
         )
 
     def inserts(self, items: List[Dict[str, Any]]):
-        points = [self._format_point(item) for item in items]
+        vectors = self._embed_many([item['text'] for item in items])
+        points = [self._format_point(item, vector) for item, vector in zip(items, vectors)]
+        if points:
+            self.client.upsert(collection_name=self.collection_name, points=points)
+
+    def upsert_vectors(self, items: List[Tuple[Union[str, int], List[float]]]):
+        """
+        Upserts precomputed dense vectors without calling the embedder.
+        The original item id is kept in the payload as `item_id`.
+        """
+        if not items:
+            return
+        points = [
+            models.PointStruct(
+                id=self._normalize_id(item_id),
+                vector=vector.tolist() if isinstance(vector, np.ndarray) else list(vector),
+                payload={"item_id": item_id}
+            )
+            for item_id, vector in items
+        ]
         self.client.upsert(collection_name=self.collection_name, points=points)
 
+    def search_vector(self, vector, top_k: int = None, score_threshold: float = None) -> List[Tuple[Union[str, int], float]]:
+        """
+        Searches with a precomputed dense vector and returns (item_id, score) pairs.
+        """
+        if top_k is None:
+            top_k = self.client.count(collection_name=self.collection_name, exact=True).count
+        if top_k == 0:
+            return []
+        result = self.client.query_points(
+            collection_name=self.collection_name,
+            query=vector.tolist() if isinstance(vector, np.ndarray) else list(vector),
+            limit=top_k,
+            score_threshold=score_threshold,
+            with_payload=True
+        ).points
+        # Qdrant treats the threshold as inclusive, the handlers expect a strict bound
+        return [
+            ((r.payload or {}).get("item_id", r.id), r.score)
+            for r in result
+            if score_threshold is None or r.score > score_threshold
+        ]
+
+    def delete_ids(self, item_ids: List[Union[str, int]]):
+        if not item_ids:
+            return
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.PointIdsList(points=[self._normalize_id(i) for i in item_ids])
+        )
+
     def retrieve(self, query: str, top_k: int = None, retrieval_pipeline=None) -> List[Dict[str, Any]]:
         embedded_query = self.embedder(query)
         if top_k is None:
@@ -161,12 +219,13 @@ class VectorEmbeddingStore:
             limit=10000
         )
 
-        updated_points = []
+        updated_items = []
         for point in all_points:
             full_data = {"id": point.id, **(point.payload or {})}
             if condition(full_data):
-                new_data = update_func(full_data)
-                updated_points.append(self._format_point(new_data))
+                updated_items.append(update_func(full_data))
+        vectors = self._embed_many([item['text'] for item in updated_items])
+        updated_points = [self._format_point(item, vector) for item, vector in zip(updated_items, vectors)]
 
         if updated_points:
             self.client.upsert(collection_name=self.collection_name, points=updated_points)
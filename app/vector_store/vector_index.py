@@ -0,0 +1,427 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+
+
+class BaseVectorIndex(ABC):
+    """
+    In-process index over the embedding vectors of a Mongo collection.
+
+    Items are keyed by the string form of their Mongo `_id`. Scores are cosine
+    similarities, so `search` can apply the same `similarity_threshold`
+    semantics as `BaseMongoHandler.search`.
+    """
+
+    # Process-local indexes must be rebuilt when another process changes the
+    # collection; shared backends (e.g. Qdrant) see every write directly.
+    process_local = True
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.is_built = False
+        # Collection version the index reflects and when it was last checked
+        self.version = None
+        self.checked_at = 0.0
+
+    def needs_build(self, expected_count: int) -> bool:
+        """
+        Whether an unbuilt index must be loaded from Mongo, which holds
+        `expected_count` vectors. Process-local indexes always start empty.
+        """
+        return True
+
+    @abstractmethod
+    def build(self, items: Iterable[Tuple[str, List[float]]]):
+        """Replaces the index content with the given (item_id, vector) pairs."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add(self, item_id: str, vector: List[float]):
+        raise NotImplementedError
+
+    def add_many(self, items: Iterable[Tuple[str, List[float]]]):
+        """Adds or replaces several (item_id, vector) pairs."""
+        for item_id, vector in items:
+            self.add(item_id, vector)
+
+    @abstractmethod
+    def remove(self, item_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def search(self, query_vector, top_k: int = None, similarity_threshold: float = None) -> List[Tuple[str, float]]:
+        """
+        Returns (item_id, similarity) pairs sorted by decreasing similarity.
+
+        Args:
+            query_vector: Dense query embedding.
+            top_k (int): Maximum number of results, or None for every match.
+            similarity_threshold (float): Only keep items with similarity > threshold.
+        """
+        raise NotImplementedError
+
+    def search_many(self, query_vectors, top_k: int = None, similarity_threshold: float = None) -> List[List[Tuple[str, float]]]:
+        """
+        Runs `search` for several query vectors and returns one result list per query.
+        """
+        return [self.search(vector, top_k=top_k, similarity_threshold=similarity_threshold) for vector in query_vectors]
+
+    @abstractmethod
+    def __len__(self):
+        raise NotImplementedError
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class MatrixVectorIndex(BaseVectorIndex):
+    """
+    Exact cosine index holding all vectors as one contiguous, pre-normalized
+    float32 matrix. A query is a single matrix-vector product followed by
+    `argpartition` for top-k.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        super().__init__()
+        self.initial_capacity = initial_capacity
+        self.matrix = None
+        self.size = 0
+        self.ids = []
+        self.row_by_id = {}
+
+    def build(self, items):
+        items = list(items)
+        with self.lock:
+            self.ids = [item_id for item_id, _ in items]
+            self.row_by_id = {item_id: row for row, item_id in enumerate(self.ids)}
+            self.size = len(items)
+            if items:
+                vectors = np.asarray([vector for _, vector in items], dtype=np.float32)
+                capacity = max(self.size, self.initial_capacity)
+                self.matrix = np.zeros((capacity, vectors.shape[1]), dtype=np.float32)
+                self.matrix[:self.size] = _normalize_rows(vectors)
+            else:
+                self.matrix = None
+            self.is_built = True
+
+    def add(self, item_id, vector):
+        vector = _normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        with self.lock:
+            row = self.row_by_id.get(item_id)
+            if row is not None:
+                self.matrix[row] = vector
+                return
+            if self.matrix is None:
+                self.matrix = np.zeros((self.initial_capacity, vector.shape[0]), dtype=np.float32)
+            elif self.size == self.matrix.shape[0]:
+                grown = np.zeros((2 * self.matrix.shape[0], self.matrix.shape[1]), dtype=np.float32)
+                grown[:self.size] = self.matrix[:self.size]
+                self.matrix = grown
+            self.matrix[self.size] = vector
+            self.ids.append(item_id)
+            self.row_by_id[item_id] = self.size
+            self.size += 1
+
+    def remove(self, item_id):
+        with self.lock:
+            row = self.row_by_id.pop(item_id, None)
+            if row is None:
+                return
+            last = self.size - 1
+            if row != last:
+                # Move the last row into the freed slot to keep the matrix dense
+                self.matrix[row] = self.matrix[last]
+                moved_id = self.ids[last]
+                self.ids[row] = moved_id
+                self.row_by_id[moved_id] = row
+            self.ids.pop()
+            self.size = last
+
+    def clear(self):
+        self.build([])
+
+    def scores(self, query_vectors) -> np.ndarray:
+        """
+        Cosine similarities of every query (rows) against every indexed item (columns).
+        """
+        queries = _normalize_rows(np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.matrix.shape[1]))
+        return queries @ self.matrix[:self.size].T
+
+    def _rank(self, scores: np.ndarray, top_k, similarity_threshold):
+        candidates = np.arange(scores.shape[0])
+        if similarity_threshold is not None:
+            candidates = np.flatnonzero(scores > similarity_threshold)
+        if top_k is not None and top_k < candidates.shape[0]:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.ids[row], float(scores[row])) for row in candidates]
+
+    def search(self, query_vector, top_k=None, similarity_threshold=None):
+        with self.lock:
+            if self.size == 0:
+                return []
+            return self._rank(self.scores(query_vector)[0], top_k, similarity_threshold)
+
+    def search_many(self, query_vectors, top_k=None, similarity_threshold=None):
+        if len(query_vectors) == 0:
+            return []
+        with self.lock:
+            if self.size == 0:
+                return [[] for _ in query_vectors]
+            # One matrix multiply scores every query against the whole catalog
+            scores = self.scores(query_vectors)
+            return [self._rank(row, top_k, similarity_threshold) for row in scores]
+
+    def __len__(self):
+        return self.size
+
+
+class HnswVectorIndex(BaseVectorIndex):
+    """
+    Approximate nearest neighbour index backed by hnswlib (cosine space).
+    """
+
+    def __init__(self, m: int = 16, ef_construction: int = 200, ef_search: int = 64, initial_capacity: int = 1024):
+        super().__init__()
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("HnswVectorIndex requires the 'hnswlib' package.") from e
+        self.hnswlib = hnswlib
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.initial_capacity = initial_capacity
+        self.index = None
+        self.dim = None
+        self.label_by_id = {}
+        self.id_by_label = {}
+        self.next_label = 0
+
+    def _init_index(self, dim: int, capacity: int):
+        self.dim = dim
+        self.index = self.hnswlib.Index(space="cosine", dim=dim)
+        self.index.init_index(max_elements=max(capacity, 1), ef_construction=self.ef_construction, M=self.m)
+        self.index.set_ef(self.ef_search)
+        self.label_by_id = {}
+        self.id_by_label = {}
+        self.next_label = 0
+
+    def _ensure_capacity(self, extra: int):
+        # get_current_count() includes elements marked as deleted
+        needed = self.index.get_current_count() + extra
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(max(needed, 2 * self.index.get_max_elements()))
+
+    def build(self, items):
+        items = list(items)
+        with self.lock:
+            if not items:
+                self.index = None
+                self.dim = None
+                self.label_by_id = {}
+                self.id_by_label = {}
+                self.next_label = 0
+                self.is_built = True
+                return
+            vectors = np.asarray([vector for _, vector in items], dtype=np.float32)
+            self._init_index(vectors.shape[1], max(len(items), self.initial_capacity))
+            labels = np.arange(len(items))
+            self.index.add_items(vectors, labels)
+            for label, (item_id, _) in zip(labels, items):
+                self.label_by_id[item_id] = int(label)
+                self.id_by_label[int(label)] = item_id
+            self.next_label = len(items)
+            self.is_built = True
+
+    def add(self, item_id, vector):
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        with self.lock:
+            if self.index is None:
+                self._init_index(vector.shape[1], self.initial_capacity)
+            if item_id in self.label_by_id:
+                self.remove(item_id)
+            self._ensure_capacity(1)
+            label = self.next_label
+            self.index.add_items(vector, np.array([label]))
+            self.label_by_id[item_id] = label
+            self.id_by_label[label] = item_id
+            self.next_label += 1
+
+    def remove(self, item_id):
+        with self.lock:
+            label = self.label_by_id.pop(item_id, None)
+            if label is None:
+                return
+            self.id_by_label.pop(label, None)
+            self.index.mark_deleted(label)
+
+    def clear(self):
+        self.build([])
+
+    def _knn_query(self, query_vectors, k):
+        """
+        knn_query that tolerates deleted elements. With items marked deleted
+        hnswlib can fail to collect `k` live neighbours and raises
+        RuntimeError; the query is then retried with a larger ef, and as a
+        last resort with a smaller k. Call with the lock held.
+        """
+        ef = max(self.ef_search, k)
+        max_ef = max(ef, self.index.get_current_count())
+        try:
+            while True:
+                self.index.set_ef(ef)
+                try:
+                    return self.index.knn_query(query_vectors, k=k)
+                except RuntimeError:
+                    if ef < max_ef:
+                        ef = min(2 * ef, max_ef)
+                    elif k > 1:
+                        k //= 2
+                    else:
+                        raise
+        finally:
+            self.index.set_ef(self.ef_search)
+
+    def search(self, query_vector, top_k=None, similarity_threshold=None):
+        query_vector = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+        with self.lock:
+            count = len(self.label_by_id)
+            if self.index is None or count == 0:
+                return []
+            # Without top_k the caller wants every match above the threshold:
+            # widen the neighbourhood until the last hit falls below it.
+            # k never exceeds the live count: deleted items can't be returned.
+            k = min(top_k or self.ef_search, count)
+            while True:
+                labels, distances = self._knn_query(query_vector, k)
+                results = [
+                    (self.id_by_label[int(label)], 1.0 - float(distance))
+                    for label, distance in zip(labels[0], distances[0])
+                    if int(label) in self.id_by_label
+                ]
+                if top_k is not None or k >= count:
+                    break
+                if similarity_threshold is None:
+                    k = count
+                elif results and results[-1][1] > similarity_threshold:
+                    k = min(2 * k, count)
+                else:
+                    break
+        if similarity_threshold is not None:
+            results = [(item_id, score) for item_id, score in results if score > similarity_threshold]
+        return results
+
+    def search_many(self, query_vectors, top_k=None, similarity_threshold=None):
+        if top_k is None or len(query_vectors) == 0:
+            return super().search_many(query_vectors, top_k=top_k, similarity_threshold=similarity_threshold)
+        query_vectors = np.asarray(query_vectors, dtype=np.float32).reshape(len(query_vectors), -1)
+        with self.lock:
+            count = len(self.label_by_id)
+            if self.index is None or count == 0:
+                return [[] for _ in query_vectors]
+            labels, distances = self._knn_query(query_vectors, min(top_k, count))
+            results = [
+                [
+                    (self.id_by_label[int(label)], 1.0 - float(distance))
+                    for label, distance in zip(row_labels, row_distances)
+                    if int(label) in self.id_by_label
+                ]
+                for row_labels, row_distances in zip(labels, distances)
+            ]
+        if similarity_threshold is not None:
+            results = [[hit for hit in hits if hit[1] > similarity_threshold] for hits in results]
+        return results
+
+    def __len__(self):
+        return len(self.label_by_id)
+
+
+class QdrantVectorIndex(BaseVectorIndex):
+    """
+    Vector index stored in a Qdrant collection through `VectorEmbeddingStore`.
+    """
+    process_local = False
+
+    def __init__(self, collection_name: str, host: str = None, api_key: str = None):
+        super().__init__()
+        from app.vector_store.qdrant_store import VectorEmbeddingStore
+        from app.vector_store.models.openai_emb import OPENAI_EMBEDDER
+        self.store = VectorEmbeddingStore(
+            collection_name=collection_name,
+            embedder=OPENAI_EMBEDDER,
+            host=host or os.getenv("QDRANT_HOST", "http://localhost:6333"),
+            api_key=api_key or os.getenv("QDRANT_API_KEY"),
+        )
+        # Qdrant is persistent: on first use the handler compares its point count
+        # with Mongo and only rebuilds when they differ (see needs_build).
+
+    def needs_build(self, expected_count: int) -> bool:
+        try:
+            return len(self) != expected_count
+        except Exception:
+            # Missing collection
+            return True
+
+    def build(self, items):
+        with self.lock:
+            self.store.reset_collection()
+            self.store.upsert_vectors(list(items))
+            self.is_built = True
+
+    def add(self, item_id, vector):
+        self.store.upsert_vectors([(item_id, vector)])
+
+    def add_many(self, items):
+        self.store.upsert_vectors(list(items))
+
+    def remove(self, item_id):
+        self.store.delete_ids([item_id])
+
+    def clear(self):
+        self.store.reset_collection()
+
+    def search(self, query_vector, top_k=None, similarity_threshold=None):
+        return self.store.search_vector(
+            query_vector,
+            top_k=top_k,
+            score_threshold=similarity_threshold
+        )
+
+    def __len__(self):
+        return self.store.client.count(collection_name=self.store.collection_name, exact=True).count
+
+
+def create_vector_index(collection_name: str, backend: Optional[str] = None) -> Optional[BaseVectorIndex]:
+    """
+    Creates the vector index backend configured for a collection.
+
+    Args:
+        collection_name (str): Mongo collection the index mirrors.
+        backend (str): 'matrix', 'hnsw', 'qdrant' or 'none'. Defaults to the
+            VECTOR_INDEX_BACKEND environment variable.
+
+    Returns:
+        BaseVectorIndex or None when indexing is disabled.
+    """
+    backend = (backend or os.getenv("VECTOR_INDEX_BACKEND", "matrix")).lower()
+    if backend == "matrix":
+        return MatrixVectorIndex()
+    if backend == "hnsw":
+        return HnswVectorIndex()
+    if backend == "qdrant":
+        return QdrantVectorIndex(collection_name=collection_name)
+    if backend in ("none", ""):
+        return None
+    raise ValueError(f"Unknown vector index backend '{backend}'. Use 'matrix', 'hnsw', 'qdrant' or 'none'.")
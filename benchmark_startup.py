@@ -0,0 +1,73 @@
+"""
+Measures the cold import cost of the app in fresh interpreters.
+
+Reports the median wall time of `import app`, the slowest imports (from
+python -X importtime) and which lazy services were created during import
+(should be none).
+
+Usage:
+    python benchmark_startup.py [--runs 5] [--top 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+from app.utils.lazy import initialized_services
+print(json.dumps({"seconds": elapsed, "initialized_services": initialized_services()}))
+"""
+
+
+def run_once(importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD]
+    # Skip the background bootstrap so only import cost is measured
+    completed = subprocess.run(
+        command, capture_output=True, text=True,
+        env={**os.environ, "STARTUP_BOOTSTRAP": "false"}
+    )
+    if completed.returncode != 0:
+        print(completed.stderr, file=sys.stderr)
+        sys.exit(completed.returncode)
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def slowest_imports(importtime_output, top):
+    """Top-level (non-nested) imports by cumulative microseconds."""
+    imports = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under their parent; app modules are always listed
+        name = name[1:]
+        if not name.startswith(" ") or name.strip().startswith("app"):
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = [run_once()[0]["seconds"] for _ in range(args.runs)]
+    result, importtime_output = run_once(importtime=True)
+
+    print(f"import app: median {statistics.median(timings):.3f}s over {args.runs} runs "
+          f"(min {min(timings):.3f}s, max {max(timings):.3f}s)")
+    print(f"Services created during import: {result['initialized_services'] or 'none'}")
+    print(f"\nSlowest imports (cumulative):")
+    for microseconds, name in slowest_imports(importtime_output, args.top):
+        print(f"  {microseconds / 1000:9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()